@@ -0,0 +1,7 @@
+"""Benchmarks for the mkbsc package
+
+Run from the project's root folder with `python -m benchmarks run -o results.json`, and compare
+two runs (e.g. from different commits) with `python -m benchmarks compare old.json new.json`.
+`python -m benchmarks estimates` checks that the bounds of estimate_kbsc_size() contain the true sizes,
+and `python -m benchmarks external` that external_to_file() writes the same game as to_file() of the KBSC.
+See `python -m benchmarks -h` for the options."""
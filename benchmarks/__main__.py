@@ -0,0 +1,64 @@
+import argparse, json, sys
+
+from . import corpus, runner
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the mkbsc package")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and write the results as json")
+    run_parser.add_argument("-o", "--output", help="the file to write the results to (default: stdout)")
+    run_parser.add_argument("-r", "--repeat", type=int, default=5, help="the number of timed calls of each operation")
+    run_parser.add_argument("--quick", action="store_true", help="only use the smallest games of each kind")
+    run_parser.add_argument("--no-memory", action="store_true", help="do not record the peak memory")
+    run_parser.add_argument("--operation", action="append", help="only run this operation (can be repeated)")
+    
+    compare_parser = subparsers.add_parser("compare", help="compare two results, exits with 1 if anything regressed")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=1.25, help="the factor which counts as a regression")
+    
+    estimates_parser = subparsers.add_parser("estimates", help="check the bounds of estimate_kbsc_size(), exits with 1 if any is wrong")
+    estimates_parser.add_argument("--quick", action="store_true", help="only use the smallest games of each kind")
+    
+    external_parser = subparsers.add_parser("external", help="check that external_to_file() writes the KBSC, exits with 1 if any file differs")
+    external_parser.add_argument("--quick", action="store_true", help="only use the smallest games of each kind")
+    
+    args = parser.parse_args(args)
+    
+    if args.command == "run":
+        results = runner.run(corpus.build(args.quick), args.repeat, not args.no_memory, args.operation,
+                             log=lambda line: print(line, file=sys.stderr))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=1)
+        else:
+            print(json.dumps(results, indent=1))
+        return 0
+    
+    elif args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        lines, regressions = runner.compare(old, new, args.threshold)
+        for line in lines:
+            print(line)
+        print(str(regressions) + " regression(s)")
+        return 1 if regressions else 0
+    
+    elif args.command == "estimates":
+        lines, failures = runner.check_estimates(corpus.build_estimates(args.quick), log=print)
+        print(str(failures) + " failure(s)")
+        return 1 if failures else 0
+    
+    elif args.command == "external":
+        lines, failures = runner.check_external(corpus.build_external(args.quick), log=print)
+        print(str(failures) + " failure(s)")
+        return 1 if failures else 0
+    
+    parser.print_help()
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
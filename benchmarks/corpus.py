@@ -0,0 +1,95 @@
+import glob, os
+
+from mkbsc import MultiplayerGame, from_file
+
+GAMES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "games")
+
+#(num_players, num_states, num_actions, num_transitions, num_non_singleton_obs, non_singleton_obs_range, seeds)
+RANDOM_FAMILIES = [
+    (2, 4, 2, 24, 1, (2, 2), range(3)),
+    (2, 6, 2, 40, 2, (2, 2), range(3)),
+    (2, 5, 3, 80, 1, (2, 3), range(3)),
+    (3, 4, 2, 48, 1, (2, 2), range(3)),
+    #sparse games with many isolated and symmetric states, which are hard for certificate()
+    (2, 40, 2, 20, 1, (2, 3), range(3)),
+]
+
+WAGON_SIZES = [3, 5, 9, 17, 33]
+
+def wagon_problem(n):
+    """Create the wagon problem (see games/wagon problem.game) on a track of n positions
+
+    Pushing alone moves the wagon one step, in a direction depending on the player. Player 0
+    cannot tell apart the positions 2k and 2k + 1, player 1 the positions 2k - 1 and 2k."""
+    L = range(n)
+    Sigma = ("wp", "wp")
+    Delta = []
+    for i in L:
+        Delta += [(i, "ww", i), (i, "pp", i), (i, "wp", (i + 1) % n), (i, "pw", (i - 1) % n)]
+    
+    Obs = [
+        [[i, i + 1] for i in range(0, n - 1, 2)] + [...],
+        [[n - 1, 0]] + [[i, i + 1] for i in range(1, n - 2, 2)] + [...]
+    ]
+    
+    return MultiplayerGame.create(L, 0, Sigma, Delta, Obs)
+
+def build(quick=False):
+    """Return the benchmark corpus as a list of (name, game) pairs
+
+    The corpus is the same every time. quick -- if true, only the smallest game of each kind is included"""
+    corpus = []
+    
+    for filename in sorted(glob.glob(os.path.join(GAMES_FOLDER, "*.game"))):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        corpus.append(("file:" + name, from_file(name, folder=GAMES_FOLDER)))
+    
+    for n in WAGON_SIZES[:1] if quick else WAGON_SIZES:
+        corpus.append(("wagon:" + str(n), wagon_problem(n)))
+    
+    for family in RANDOM_FAMILIES[:1] if quick else RANDOM_FAMILIES:
+        players, states, actions, transitions, obs, obs_range, seeds = family
+        for seed in seeds:
+            name = "random:{0}p{1}s{2}a{3}t:{4}".format(players, states, actions, transitions, seed)
+            corpus.append((name, MultiplayerGame.create_random(players, states, actions, transitions, 
+                                                               [obs] * players, [obs_range] * players, seed=seed)))
+    
+    return corpus
+
+#(num_players, num_states, num_actions, num_transitions, num_non_singleton_obs, non_singleton_obs_range, seeds)
+#of games whose KBSC is the base game of an estimate, so that few tuples of player states have a common state
+ESTIMATE_FAMILIES = [
+    (3, 10, 2, 120, 3, (2, 3), [11]),
+]
+
+def build_estimates(quick=False):
+    """Return the corpus used to check estimate_kbsc_size() as a list of (name, game) pairs
+
+    This is the benchmark corpus, and the KBSC of each game in ESTIMATE_FAMILIES.
+    quick -- if true, only the smallest game of each kind is included"""
+    corpus = build(quick)
+    
+    for family in ESTIMATE_FAMILIES:
+        players, states, actions, transitions, obs, obs_range, seeds = family
+        for seed in seeds:
+            name = "kbsc:random:{0}p{1}s{2}a{3}t:{4}".format(players, states, actions, transitions, seed)
+            corpus.append((name, MultiplayerGame.create_random(players, states, actions, transitions, 
+                                                               [obs] * players, [obs_range] * players, seed=seed).KBSC()))
+    
+    return corpus
+
+def build_external(quick=False):
+    """Return the corpus used to check external_to_file() as a list of (name, game) pairs
+
+    This is the benchmark corpus, which has games with unreachable states in the last of
+    RANDOM_FAMILIES. quick -- if true, only the smallest game of each kind is included, and
+    the first game of the last of RANDOM_FAMILIES"""
+    corpus = build(quick)
+    
+    if quick:
+        players, states, actions, transitions, obs, obs_range, seeds = RANDOM_FAMILIES[-1]
+        name = "random:{0}p{1}s{2}a{3}t:{4}".format(players, states, actions, transitions, seeds[0])
+        corpus.append((name, MultiplayerGame.create_random(players, states, actions, transitions, 
+                                                           [obs] * players, [obs_range] * players, seed=seeds[0])))
+    
+    return corpus
@@ -0,0 +1,229 @@
+import gc, os, platform, subprocess, sys, tempfile, time, tracemalloc
+
+from mkbsc import iterate_until_isomorphic, to_string, from_string, to_file, from_file, external_to_file
+
+def _operations(game):
+    """Return the benchmarked operations on a game as (name, function) pairs
+
+    Everything the operations need, except what they measure, is computed here"""
+    GK = game.KBSC()
+    GK_copy = from_string(to_string(GK))
+    serialized = to_string(GK)
+    
+    operations = [
+        ("KBSC", game.KBSC),
+        ("KBSC2", GK.KBSC),
+    ]
+    if game.player_count > 1:
+        games = [game.project(player).KBSC() for player in range(game.player_count)]
+        operations.append(("synchronous_product", lambda: game._synchronous_product(games)))
+    
+    operations += [
+        ("isomorphic", lambda: GK.isomorphic(GK_copy, consider_observations=True)),
+        ("certificate", game.certificate),
+        ("iterate_until_isomorphic", lambda: iterate_until_isomorphic(game, 3, verbose=False)),
+        ("to_string", lambda: to_string(GK)),
+        ("from_string", lambda: from_string(serialized)),
+        ("to_dot", lambda: GK.to_dot(epistemic="nice")),
+    ]
+    return operations
+
+def _time(function, repeat):
+    """Return the wall times of repeated calls to the function"""
+    times = []
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+def _peak_memory(function):
+    """Return the peak memory in bytes allocated during a call to the function"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+#modules which are only needed for rendering and isomorphism, and should not be loaded by "import mkbsc"
+LAZY_MODULES = ("networkx", "pydot", "pyparsing")
+
+def _import_result(repeat):
+    """Time "import mkbsc" in fresh interpreters, minus the startup time of the interpreter itself
+
+    Also records which of LAZY_MODULES were loaded by the import"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = "import sys, time; t = time.perf_counter(); import mkbsc; print(time.perf_counter() - t); print(','.join(m for m in {0!r} if m in sys.modules))".format(LAZY_MODULES)
+    
+    times = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", script], cwd=root).decode().split("\n")
+        times.append(float(output[0]))
+    
+    return {
+        "game": "-",
+        "states": None,
+        "transitions": None,
+        "operation": "import",
+        "times": times,
+        "min": min(times),
+        "median": sorted(times)[len(times) // 2],
+        "peak_memory": None,
+        "lazy_modules_loaded": [module for module in output[1].split(",") if module],
+    }
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(corpus, repeat=5, memory=True, operations=None, log=None):
+    """Benchmark the operations on every game in the corpus and return the results as a dict
+
+    corpus -- a list of (name, game) pairs, see corpus.py
+    repeat -- the number of timed calls of each operation
+    memory -- if true, also records the peak memory of each operation in a separate call
+    operations -- the names of the operations to run. Use None (default) to run all of them
+    log -- if given, a function which is called with a line of progress for each result"""
+    
+    results = []
+    if operations is None or "import" in operations:
+        result = _import_result(repeat)
+        results.append(result)
+        if log:
+            log("{0:<28} {1:<26} {2:10.6f} s".format("-", "import", result["min"]))
+    
+    for name, game in corpus:
+        for operation, function in _operations(game):
+            if operations is not None and operation not in operations:
+                continue
+            
+            times = _time(function, repeat)
+            result = {
+                "game": name,
+                "states": len(game.states),
+                "transitions": len(game.transitions),
+                "operation": operation,
+                "times": times,
+                "min": min(times),
+                "median": sorted(times)[len(times) // 2],
+                "peak_memory": _peak_memory(function) if memory else None,
+            }
+            results.append(result)
+            
+            if log:
+                log("{0:<28} {1:<26} {2:10.6f} s".format(name, operation, result["min"]))
+    
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare(old, new, threshold=1.25):
+    """Compare two benchmark results, as returned by run()
+
+    Returns a list of lines describing each (game, operation) present in both, and the number of
+    regressions, i.e. operations whose minimum time or peak memory grew by more than the threshold factor,
+    and imports of mkbsc which load more of LAZY_MODULES than before"""
+    
+    old_results = {(result["game"], result["operation"]): result for result in old["results"]}
+    
+    lines = []
+    regressions = 0
+    for result in new["results"]:
+        key = (result["game"], result["operation"])
+        if key not in old_results:
+            continue
+        previous = old_results[key]
+        
+        time_ratio = result["min"] / previous["min"] if previous["min"] else float("inf")
+        memory_ratio = None
+        if result["peak_memory"] is not None and previous["peak_memory"]:
+            memory_ratio = result["peak_memory"] / previous["peak_memory"]
+        
+        regressed = time_ratio > threshold or (memory_ratio is not None and memory_ratio > threshold) or \
+                    len(result.get("lazy_modules_loaded", ())) > len(previous.get("lazy_modules_loaded", ()))
+        if regressed:
+            regressions += 1
+        
+        lines.append("{0:<28} {1:<26} time x{2:<8.3f} memory {3:<10} {4}".format(key[0], key[1], time_ratio,
+                     "-" if memory_ratio is None else "x{0:.3f}".format(memory_ratio), "REGRESSION" if regressed else ""))
+    
+    return lines, regressions
+
+def check_estimates(corpus, seeds=range(3), log=None):
+    """Check that the bounds of estimate_kbsc_size() contain the true size of the KBSC of every game in the corpus
+
+    The estimates are made with a small time budget, so that most of them are not exact.
+    Returns a list of lines describing each estimate, and the number of true sizes outside the bounds
+
+    corpus -- a list of (name, game) pairs, see corpus.py
+    seeds -- the seeds of the random number generator used for each game
+    log -- if given, a function which is called with each line"""
+    
+    lines = []
+    failures = 0
+    for name, game in corpus:
+        GK = game.KBSC()
+        states = len(GK.states)
+        transitions = len(GK.transitions)
+        for seed in seeds:
+            estimate = game.estimate_kbsc_size(time_budget=0.05, explore=0.01, samples=256, seed=seed)
+            low, high = estimate["states_bounds"]
+            transitions_low, transitions_high = estimate["transitions_bounds"]
+            failed = not (low <= states <= high and transitions_low <= transitions <= transitions_high)
+            if failed:
+                failures += 1
+            
+            line = "{0:<28} seed {1:<3} states {2} in [{3}, {4}] transitions {5} in [{6}, {7}] {8}".format(
+                name, seed, states, low, high, transitions, transitions_low, transitions_high, "FAILED" if failed else "")
+            lines.append(line)
+            if log:
+                log(line)
+    
+    return lines, failures
+
+def check_external(corpus, log=None):
+    """Check that external_to_file() writes the same game as to_file() of the KBSC, for every game in the corpus
+
+    The games are compared by their sizes and certificates. Returns a list of lines describing each
+    game, and the number of games whose files differ
+
+    corpus -- a list of (name, game) pairs, see corpus.py
+    log -- if given, a function which is called with each line"""
+    
+    lines = []
+    failures = 0
+    with tempfile.TemporaryDirectory() as folder:
+        for name, game in corpus:
+            to_file(game.KBSC(), "kbsc", folder)
+            external_to_file(game, "external", folder, workdir=folder)
+            
+            unreachable = len(game.states) - len(game.reachable())
+            try:
+                expected = from_file("kbsc", folder)
+                actual = from_file("external", folder)
+                failed = (len(actual.states), len(actual.transitions), actual.certificate()) != \
+                         (len(expected.states), len(expected.transitions), expected.certificate())
+            except AssertionError:
+                failed = True
+            if failed:
+                failures += 1
+            
+            line = "{0:<28} {1} unreachable states {2}".format(name, unreachable, "FAILED" if failed else "")
+            lines.append(line)
+            if log:
+                log(line)
+    
+    return lines, failures
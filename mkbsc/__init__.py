@@ -4,5 +4,11 @@ from .observation       import Observation
 from .partitioning      import Partitioning
 from .transition        import Transition
 from .multiplayer_game  import MultiplayerGame
-from .serialization     import from_file, to_file, from_string, to_string, export
+from .symmetry          import Symmetry
+from .serialization     import from_file, to_file, to_files, from_npz, to_npz, stream_to_file, from_string, to_string, export, SharedGame
 from .helper_functions  import iterate_until_isomorphic
+from .stats             import KBSCStats
+from .incremental       import IncrementalKBSC
+from .index             import IsomorphismIndex
+from .external          import external_to_file
+from .simulation        import simulate
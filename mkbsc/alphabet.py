@@ -14,6 +14,14 @@ class Alphabet:
                 s.add(action)
         
         self.actions = tuple(tuple(a for a in playeractions) for playeractions in actions)
+        
+        #the joint actions are numbered by their position in joint_actions, and the actions of each
+        #player by their position in the player's alphabet
+        self.joint_actions = tuple(_permute(self.actions))
+        self.joint_action_ids = {joint_action: i for i, joint_action in enumerate(self.joint_actions)}
+        self.action_ids = tuple({action: i for i, action in enumerate(playeractions)} for playeractions in self.actions)
+        #components[player][i] is the id of the player's action in the joint action with id i
+        self.components = tuple(tuple(self.action_ids[player][joint_action[player]] for joint_action in self.joint_actions) for player in range(len(self.actions)))
     def __getitem__(self, index):
         """Get the alphabet (a tuple of the possible actions) for the specified player"""
         return self.actions[index]
@@ -28,6 +36,6 @@ class Alphabet:
         return str(self.actions)
         
     def permute(self):
-        """Generate every possible joint action"""
-        for joint_action in _permute(self.actions):
+        """Generate every possible joint action, in the order of their ids"""
+        for joint_action in self.joint_actions:
             yield joint_action
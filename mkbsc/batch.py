@@ -0,0 +1,197 @@
+"""Run the same analysis on every game in a folder, in parallel
+
+ex. python -m mkbsc.batch games -p iterate,profile -w 4 -o report.csv"""
+
+import argparse, csv, glob, json, os, sys, time
+from multiprocessing import Pool
+
+from .serialization     import from_file, to_file, export
+from .helper_functions  import iterate_until_isomorphic
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from signal import signal, setitimer, SIGALRM, ITIMER_REAL
+except ImportError:
+    setitimer = None
+
+STEPS = ("kbsc", "iterate", "profile", "save", "export")
+
+class _Timeout(BaseException):
+    """Raised by the timer, derived from BaseException so that except Exception in the steps does not catch it"""
+    pass
+
+def _raise_timeout(signum, frame):
+    raise _Timeout()
+
+def _init_worker(memory_limit):
+    """Limit the address space of a worker process to memory_limit bytes, if the platform allows it"""
+    if memory_limit and resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            memory_limit = min(memory_limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+def _run_job(job):
+    """Run the pipeline on a single game file and return a row of the report"""
+
+    path, pipeline, options = job
+    name = os.path.splitext(os.path.basename(path))[0]
+    row = {"file": path, "status": "ok"}
+
+    if options["timeout"] and setitimer is not None:
+        signal(SIGALRM, _raise_timeout)
+        setitimer(ITIMER_REAL, options["timeout"])
+
+    start = time.perf_counter()
+    try:
+        #the timer is disarmed before the handlers run, so that it can not fire inside them
+        try:
+            step_start = time.perf_counter()
+            game = from_file(name, os.path.dirname(path), os.path.splitext(path)[1], validate=options["validate"])
+            row["time load"] = time.perf_counter() - step_start
+            row["players"] = game.player_count
+            row["states"] = len(game.states)
+            row["transitions"] = len(game.transitions)
+
+            for step in pipeline:
+                step_start = time.perf_counter()
+
+                if step == "kbsc":
+                    game = game.KBSC()
+
+                elif step == "iterate":
+                    log, game, iso_type = iterate_until_isomorphic(game, options["limit"], verbose=False)
+                    row["iterations"] = len(log) - 1
+                    row["stabilized"] = iso_type
+
+                elif step == "profile":
+                    row["profile"] = game.partitioning_profile().strip()
+
+                elif step == "save":
+                    to_file(game, name, options["folder"])
+
+                elif step == "export":
+                    export(game, name, folder=options["folder"], epistemic=options["epistemic"])
+
+                row["time " + step] = time.perf_counter() - step_start
+
+            row["final states"] = len(game.states)
+            row["final transitions"] = len(game.transitions)
+        finally:
+            if options["timeout"] and setitimer is not None:
+                setitimer(ITIMER_REAL, 0)
+
+    except _Timeout:
+        row["status"] = "timeout"
+    except MemoryError:
+        row["status"] = "memory"
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = type(e).__name__ + ": " + str(e)
+
+    row["time total"] = time.perf_counter() - start
+    return row
+
+def run_batch(folder, pipeline=("iterate", "profile"), workers=None, timeout=None, memory_limit=None,
+              limit=-1, output_folder=None, epistemic="isocheck", validate=False, fileext=".game", log=None):
+    """Run a pipeline of steps on every game in a folder on a pool of processes, and return a list of report rows
+
+    Each worker imports the package once and then handles many games. The rows are dicts with the
+    file, the status ("ok", "timeout", "memory" or "error"), the sizes of the loaded and the final
+    game, the number of iterations and the time of every step.
+
+    folder -- the folder with the games
+    pipeline -- the steps to apply to each game, in order, from STEPS: "kbsc" applies the KBSC once,
+                "iterate" applies iterate_until_isomorphic(), "profile" records the partitioning_profile(),
+                "save" writes the game with to_file() and "export" renders it with export()
+    workers -- the number of processes, by default the number of CPUs
+    timeout -- the maximum number of seconds spent on a single game
+    memory_limit -- the maximum size in bytes of the address space of a worker
+    limit -- the maximum number of iterations of "iterate"
+    output_folder -- the folder for "save" and "export", by default the folder of the games. It must be
+                     given, and differ from the folder of the games, when the pipeline includes "save", so that
+                     the games are never written over
+    log -- if given, called with every row as soon as it is done
+
+    The timeout and memory limit are only enforced on platforms with signal.setitimer() and the resource module"""
+
+    for step in pipeline:
+        if step not in STEPS:
+            raise ValueError("Unknown step: " + str(step))
+    if "save" in pipeline and (output_folder is None or os.path.realpath(output_folder) == os.path.realpath(folder)):
+        raise ValueError("The save step needs an output folder other than the folder of the games")
+
+    options = {
+        "timeout": timeout,
+        "limit": limit,
+        "folder": output_folder if output_folder is not None else folder,
+        "epistemic": epistemic,
+        "validate": validate
+    }
+    if "save" in pipeline or "export" in pipeline:
+        os.makedirs(options["folder"], exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(glob.escape(folder), "*" + fileext)))
+    jobs = [(path, tuple(pipeline), options) for path in paths]
+
+    rows = []
+    with Pool(workers, _init_worker, (memory_limit,)) as pool:
+        for row in pool.imap(_run_job, jobs):
+            rows.append(row)
+            if log:
+                log(row)
+    return rows
+
+def write_report(rows, filename):
+    """Write the report rows to a file, as CSV if the filename ends with .csv and as JSON otherwise"""
+
+    if filename.endswith(".csv"):
+        fields = []
+        for row in rows:
+            for key in row:
+                if key not in fields:
+                    fields.append(key)
+        with open(filename, "w", newline="", encoding="utf8") as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(filename, "w", encoding="utf8") as f:
+            json.dump(rows, f, indent=1)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m mkbsc.batch", description="Run an analysis on every game in a folder")
+    parser.add_argument("folder", help="the folder with the .game files")
+    parser.add_argument("-p", "--pipeline", default="iterate,profile", help="comma separated steps among " + ", ".join(STEPS) + " (default: iterate,profile)")
+    parser.add_argument("-w", "--workers", type=int, help="the number of processes (default: the number of CPUs)")
+    parser.add_argument("-t", "--timeout", type=float, help="the maximum number of seconds per game")
+    parser.add_argument("-m", "--memory", type=int, help="the maximum memory per worker in MB")
+    parser.add_argument("-l", "--limit", type=int, default=-1, help="the maximum number of iterations (default: no limit)")
+    parser.add_argument("-e", "--epistemic", default="isocheck", help="how to render the states when exporting (default: isocheck)")
+    parser.add_argument("--output-folder", help="the folder for saved and exported games, required with the save step and different from the folder of the games (default: the folder of the games)")
+    parser.add_argument("--validate", action="store_true", help="validate the games when loading them")
+    parser.add_argument("-o", "--output", help="the report file, CSV if it ends with .csv and JSON otherwise (default: JSON on stdout)")
+
+    args = parser.parse_args(args)
+
+    def log(row):
+        print(row["file"], row["status"], "{0:.3f} s".format(row["time total"]), file=sys.stderr)
+
+    try:
+        rows = run_batch(args.folder, args.pipeline.split(","), args.workers, args.timeout,
+                         args.memory * 1024 * 1024 if args.memory else None, args.limit, args.output_folder,
+                         args.epistemic, args.validate, log=log)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output:
+        write_report(rows, args.output)
+    else:
+        print(json.dumps(rows, indent=1))
+    return 0 if all(row["status"] == "ok" for row in rows) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
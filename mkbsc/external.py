@@ -0,0 +1,141 @@
+from .serialization     import _joint_action_labels
+from .helper_functions  import _number_states, _permute, consistent
+from .stats             import NO_STATS
+
+from json       import dumps
+from tempfile   import TemporaryDirectory, TemporaryFile
+from shutil     import copyfileobj
+import os
+
+def external_to_file(game, filename, folder="games", fileext=".game", workdir=None, cache_size=256, stats=None):
+    """Apply the KBSC to a game with the explored states kept on disk, and write the constructed game to a file
+
+    Meant for games whose KBSC does not fit in memory. Only the KBSC of the projection onto each player
+    is kept in memory. The knowledge tuples of the constructed game are stored in an SQLite database,
+    where they are numbered in the order they are discovered, so the frontier of the breadth-first
+    search is the tuples numbered after the one being explored. A tuple is looked up in the database
+    when it is discovered, so every tuple is only stored and explored once. The transitions are
+    written to a temporary file. The file is equivalent to the one written by to_file(game.KBSC(), ...).
+    Returns the number of states in the constructed game
+
+    workdir -- the folder of the database and the temporary file, by default the system's temporary folder
+    cache_size -- the memory in MB used by SQLite to cache the database
+    stats -- if given, a KBSCStats object, see MultiplayerGame.KBSC()"""
+    import sqlite3
+
+    if stats is None:
+        stats = NO_STATS
+    if folder and len(folder) != 0:
+        folder += "/"
+    else:
+        folder = ""
+
+    games = game._player_KBSCs(stats)
+    player_count = game.player_count
+    player_states = [list(player_game.states) for player_game in games]
+    player_ids = [{state: i for i, state in enumerate(states)} for states in player_states]
+
+    #the states of the game, and the states in their knowledge, are numbered first. Only the reachable
+    #states are in the knowledge of the constructed states, and any other state would be read as a
+    #state of the constructed game without an observation
+    inner_base, inner_knowledge, inner_ids = _number_states(game, game.reachable())
+    offset = len(inner_ids)
+    player_labels = [[",".join([str(inner_ids[s]) for s in state.knowledges[0]]) for state in states] for states in player_states]
+    labels = _joint_action_labels(game.alphabet)
+
+    columns = ", ".join(["k" + str(player) for player in range(player_count)])
+    select_key = "SELECT " + columns + " FROM states WHERE id = ?"
+    select_id = "SELECT id FROM states WHERE " + " AND ".join(["k{0} = ?".format(player) for player in range(player_count)])
+    insert = "INSERT INTO states (" + columns + ") VALUES (" + ", ".join(["?"] * player_count) + ")"
+
+    with TemporaryDirectory(dir=workdir) as directory:
+        connection = sqlite3.connect(os.path.join(directory, "states.db"))
+        try:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("PRAGMA cache_size = " + str(-1024 * cache_size))
+            connection.execute("CREATE TABLE states (id INTEGER PRIMARY KEY, " + columns + ", UNIQUE (" + columns + "))")
+
+            with TemporaryFile(mode="w+", encoding="utf8", newline="\n", dir=directory) as transition_file:
+                count = 0
+                explored = 0
+                inconsistent = 0
+                transition_count = 0
+
+                with stats.phase("external synchronous product"):
+                    connection.execute(insert, tuple(player_ids[i][player_game.initial_state] for i, player_game in enumerate(games)))
+                    count += 1
+
+                    while explored < count:
+                        explored += 1
+                        if stats.progress and explored % stats.interval == 0:
+                            stats.progress(explored, count - explored, count)
+
+                        key = connection.execute(select_key, (explored,)).fetchone()
+                        state_tuple = tuple(player_states[i][k] for i, k in enumerate(key))
+                        possible = consistent(state_tuple)
+
+                        for action_id, joint_action in enumerate(game.alphabet.joint_actions):
+                            possible_post = game.transitions.post(joint_action, possible)
+                            if not len(possible_post):
+                                continue
+
+                            players_post = [[state for state in games[i].post(joint_action[i], state_tuple[i]) if not state.knowledges[0].isdisjoint(possible_post)] for i in range(player_count)]
+
+                            for possible_knowledge in _permute(players_post):
+                                successor_key = tuple(player_ids[i][state] for i, state in enumerate(possible_knowledge))
+                                row = connection.execute(select_id, successor_key).fetchone()
+                                if row is None:
+                                    if not len(consistent(possible_knowledge)):
+                                        inconsistent += 1
+                                        continue
+                                    id = connection.execute(insert, successor_key).lastrowid
+                                    count += 1
+                                else:
+                                    id = row[0]
+
+                                transition_file.write("{0} {1} {2}\n".format(offset + explored - 1, labels[action_id], offset + id - 1))
+                                transition_count += 1
+
+                stats.count("knowledge tuples explored", explored)
+                stats.count("inconsistent knowledge tuples", inconsistent)
+                stats.count("multiplayer transitions created", transition_count)
+                stats.count("multiplayer states created", count)
+
+                with stats.phase("writing the game"), open(folder + filename + fileext, mode="w", encoding="utf8", newline="\n") as f:
+                    f.write("Alphabet:\n")
+                    for playeralphabet in game.alphabet:
+                        f.write(",".join([repr(action) for action in playeralphabet]) + "\n")
+
+                    f.write("\nBase States:\n")
+                    for state in inner_base:
+                        f.write("{0}={1}\n".format(inner_ids[state], repr(state[0])))
+
+                    f.write("\nKnowledge States:\n")
+                    for state in inner_knowledge:
+                        f.write("{0}={1}\n".format(inner_ids[state], "|".join([",".join([str(inner_ids[s]) for s in knowledge]) for knowledge in state.knowledges])))
+                    for row in connection.execute("SELECT id, " + columns + " FROM states ORDER BY id"):
+                        f.write("{0}={1}\n".format(offset + row[0] - 1, "|".join([player_labels[i][k] for i, k in enumerate(row[1:])])))
+
+                    f.write("\nInitial State: " + str(offset) + "\n")
+
+                    #the states with the same knowledge of a player form an observation
+                    f.write("\nObservations:\n")
+                    for player in range(player_count):
+                        last = None
+                        for knowledge, id in connection.execute("SELECT k{0}, id FROM states ORDER BY k{0}, id".format(player)):
+                            if last is not None:
+                                f.write("," if knowledge == last else "|")
+                            f.write(str(offset + id - 1))
+                            last = knowledge
+                        f.write("\n")
+
+                    f.write("\nTransitions:\n")
+                    transition_file.seek(0)
+                    copyfileobj(transition_file, f)
+
+                    f.write("\nAttributes: " + dumps(game.attributes) + "\n")
+        finally:
+            connection.close()
+
+    return count
@@ -1,5 +1,9 @@
-from itertools      import combinations, chain
+from itertools      import combinations, chain, islice
 from collections    import deque
+from array          import array
+
+from .state         import State, _pick
+from .stats         import NO_STATS
 
 
 def _permute(iterables):
@@ -32,35 +36,93 @@ def _lookup(states, knowledge, single_knowledge=True):
         
     raise KeyError("Could not find a matching state")
     
-def _lookup_by_base(states, base):
-    """Find the state with the specified consistent base (see state.py)"""
+def _base_index(states):
+    """Index the states by their consistent base (see state.py)
+
+    Returns a dict from consistent bases to sets of states, and a dict from the knowledge in the base states to the base states"""
     
-    res = set()
+    index = {}
+    base_states = {}
     for state in states:
-        b = state.consistent_base()
-        if len(b) != len(base):
-            continue
-        
-        base_to_check = base.copy()
-        
-        include = True
-        for basestate in b:
-            for valid in base_to_check:
-                if basestate is valid or basestate.knowledges == (valid,):
-                    base_to_check.remove(valid)
-                    continue
-                include = False
-                break
-            if not include:
-                break
-        
-        if include and len(base_to_check) == 0:
-            res.add(state)
+        base = state.consistent_base()
+        if base in index:
+            index[base].add(state)
+        else:
+            index[base] = {state}
+            for basestate in base:
+                base_states[basestate.knowledges[0]] = basestate
     
-    return res
+    return index, base_states
+    
+def _lookup_by_base(index, base):
+    """Find the states with the specified consistent base in an index created by _base_index
+
+    base -- an iterable of base states, or of the knowledge in base states"""
+    
+    index, base_states = index
+    
+    key = set()
+    for valid in base:
+        if type(valid) is State:
+            key.add(valid)
+        elif valid in base_states:
+            key.add(base_states[valid])
+        else:
+            return set()
+    
+    return set(index.get(frozenset(key), ()))
+
+def _previous_successors(previous):
+    """Index the states of an earlier KBSC by their knowledge, and the transitions by their starting state"""
+    states = {}
+    successors = {}
+    if previous is None:
+        return states, successors
+    
+    for state in previous.states:
+        states[state.knowledges] = state
+        successors[state] = []
+    for start, joint_action, end in previous.transitions.triples():
+        successors[start].append((joint_action, end))
+    
+    return states, successors
+
+def _number_states(game, states=None):
+    """Number the states of a game and, recursively, the states in their knowledge
+
+    The base states are numbered from 0, followed by the knowledge states from the innermost level
+    outwards, so that every state is numbered after the states in its knowledge.
+    Returns (base_states, knowledge_states, state_ids), where the lists are in the order of the ids
+
+    states -- the states of the game to number, by default all of them"""
+    
+    pushed = []
+    if states is None:
+        states = game.states
+    while type(_pick(states)[0]) is frozenset:
+        newstates = set()
+        for state in states:
+            pushed.append(state)
+            for player in range(len(state.knowledges)):
+                newstates.update(state[player])
+        states = newstates
+    
+    base_states = list(states)
+    knowledge_states = pushed[::-1]
+    state_ids = {state: i for i, state in enumerate(chain(base_states, knowledge_states))}
+    return base_states, knowledge_states, state_ids
+
+def _narrow(values):
+    """Copy an array of non-negative integers to an array of the smallest type which can hold them"""
+    
+    bound = max(values, default=0)
+    for typecode in "BHIL":
+        if bound < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+    return values
 
 def _reachable(graph, initial):
-    """Return all reachable nodes in a networkx graph reachable from a node"""
+    """Return all nodes reachable from a node in a graph, or any object with a neighbors(node) method"""
     res = set()
     to_check = deque([initial])
     
@@ -72,11 +134,323 @@ def _reachable(graph, initial):
                 res.add(neighbor)
     return res
 
+def _coarsest_bisimulation(transitions, partition):
+    """Refine a partition of states into the coarsest bisimulation contained in it
+
+    Uses the partition refinement of Paige and Tarjan: the blocks are kept stable with respect to a
+    coarser partition of compound blocks, which is split by the smaller of two of its blocks at a time.
+    Counting the successors of every state in each compound block allows a single pass over the
+    predecessors of the smaller block to split by both it and the rest of the compound block.
+
+    transitions -- the transitions of the game as (start, joint_action, end) tuples
+    partition -- an iterable of disjoint iterables of states, covering every state in the transitions
+    
+    Returns a dict from each state to the number of its block"""
+    
+    #the distinct predecessors of each state, for each action
+    predecessors = {}
+    counts = {}
+    edges = set()
+    for start, joint_action, end in transitions:
+        edge = (start, joint_action, end)
+        if edge in edges:
+            continue
+        edges.add(edge)
+        
+        if joint_action not in predecessors:
+            predecessors[joint_action] = {}
+        by_action = predecessors[joint_action]
+        if end in by_action:
+            by_action[end].append(start)
+        else:
+            by_action[end] = [start]
+        
+        #the number of successors of the state with the action in the compound block 0 (all states)
+        key = (start, joint_action, 0)
+        counts[key] = counts.get(key, 0) + 1
+    
+    block_of = {}
+    blocks = []
+    for block in partition:
+        block = set(block)
+        for state in block:
+            block_of[state] = len(blocks)
+        blocks.append(block)
+    
+    compounds = [set(range(len(blocks)))]
+    compound_of = [0] * len(blocks)
+    nontrivial = {0} if len(blocks) > 1 else set()
+    
+    def split(marked):
+        """Split every block into its marked and unmarked states"""
+        touched = {}
+        for state in marked:
+            block = block_of[state]
+            if block in touched:
+                touched[block].append(state)
+            else:
+                touched[block] = [state]
+        
+        for block, states in touched.items():
+            if len(states) == len(blocks[block]):
+                continue
+            
+            new = len(blocks)
+            blocks.append(set(states))
+            blocks[block].difference_update(states)
+            for state in states:
+                block_of[state] = new
+            
+            compound = compound_of[block]
+            compound_of.append(compound)
+            compounds[compound].add(new)
+            nontrivial.add(compound)
+    
+    #the initial partition has to be stable with respect to the set of all states
+    for action, by_action in predecessors.items():
+        split(set(chain.from_iterable(by_action.values())))
+    
+    while len(nontrivial):
+        compound = nontrivial.pop()
+        
+        first, second = list(islice(compounds[compound], 2))
+        splitter = first if len(blocks[first]) <= len(blocks[second]) else second
+        
+        compounds[compound].remove(splitter)
+        if len(compounds[compound]) > 1:
+            nontrivial.add(compound)
+        new_compound = len(compounds)
+        compounds.append({splitter})
+        compound_of[splitter] = new_compound
+        
+        #the splitter itself can be split below
+        splitter_states = tuple(blocks[splitter])
+        for action, by_action in predecessors.items():
+            count = {}
+            for state in splitter_states:
+                for predecessor in by_action.get(state, ()):
+                    count[predecessor] = count.get(predecessor, 0) + 1
+            
+            if not len(count):
+                continue
+            
+            #split by the predecessors of the splitter, and then by the predecessors of the rest of the compound block
+            split(count)
+            split([state for state in count if count[state] == counts[(state, action, compound)]])
+            
+            for state in count:
+                key = (state, action, compound)
+                counts[key] -= count[state]
+                if counts[key] == 0:
+                    del counts[key]
+                counts[(state, action, new_compound)] = count[state]
+    
+    return block_of
+
+def _partition_isomorphic(G1, G2, initial1, initial2, classes1=(), classes2=()):
+    """Check if two networkx multigraphs are isomorphic by a mapping which keeps the data of the edges,
+    maps initial1 to initial2 and maps the classes of each partition onto the classes of the other
+
+    See _partition_matcher()"""
+    return _partition_matcher(G1, G2, initial1, initial2, classes1, classes2).is_isomorphic()
+
+def _partition_matcher(G1, G2, initial1, initial2, classes1=(), classes2=()):
+    """Create a networkx matcher for the isomorphisms between two multigraphs which keep the data of the
+    edges, map initial1 to initial2 and map the classes of each partition onto the classes of the other
+
+    The partitions are checked while the mapping is built, by making sure that a node is mapped into
+    the class which the rest of its class has been mapped to, or into an unused class of the same size.
+
+    classes1, classes2 -- a dict for each partition, from every node to the list of nodes in its class.
+                          The lists are compared by identity. Nodes alone in their class can be left out"""
+    from networkx.algorithms.isomorphism import MultiDiGraphMatcher
+    
+    class Matcher(MultiDiGraphMatcher):
+        def semantic_feasibility(self, n1, n2):
+            if (n1 is initial1) != (n2 is initial2):
+                return False
+            
+            for c1, c2 in zip(classes1, classes2):
+                members1 = c1.get(n1, ())
+                members2 = c2.get(n2, ())
+                if len(members1) != len(members2):
+                    return False
+                
+                for m1 in members1:
+                    if m1 in self.core_1:
+                        if c2.get(self.core_1[m1]) is not members2:
+                            return False
+                        break
+                else:
+                    for m2 in members2:
+                        if m2 in self.core_2:
+                            return False
+            
+            return MultiDiGraphMatcher.semantic_feasibility(self, n1, n2)
+    
+    return Matcher(G1, G2, edge_match=lambda x, y: x == y)
+
+def _canonical_encoding(nodes, initial, edges, partitions=()):
+    """Find an encoding of a graph which is the same for exactly the isomorphic graphs
+
+    The nodes are colored by refining their initial colors until they are stable, i.e. until nodes
+    of the same color have the same number of edges with each label to and from every color, and
+    classmates of every color. While some color is shared by several nodes, each of them is given a
+    unique color in turn, and the smallest of the resulting encodings is used. As in nauty, two leaves
+    of this search with the same encoding give an automorphism of the graph. Nodes in the same orbit
+    of the automorphisms which fix the nodes given unique colors so far lead to the same encodings, so
+    only one of them is given a unique color, and when an automorphism maps the first or the smallest
+    leaf onto the current one, the search returns to where their paths split. Isolated nodes are only
+    counted, since they are all interchangeable.
+
+    nodes -- a list of the nodes
+    initial -- a node which must be mapped onto the corresponding node of the other graph
+    edges -- a set of (start, label, end) tuples, where the labels can be compared with each other
+    partitions -- lists of classes of nodes which must be mapped onto each other. Nodes alone in
+                  their class can be left out"""
+    
+    outgoing = {node: [] for node in nodes}
+    incoming = {node: [] for node in nodes}
+    for start, label, end in edges:
+        outgoing[start].append((label, end))
+        incoming[end].append((label, start))
+    
+    class_of = []
+    for partition in partitions:
+        classes = {}
+        for members in partition:
+            for node in members:
+                classes[node] = members
+        class_of.append(classes)
+    
+    #nodes without edges or classmates can be mapped onto each other freely, so only their number is encoded
+    node_count = len(nodes)
+    nodes = [node for node in nodes if node is initial or len(outgoing[node]) or len(incoming[node]) or any(node in classes for classes in class_of)]
+    
+    def refine(colors):
+        #a color is the position of its first node when the nodes are ordered by color, so only the
+        #nodes sharing a color need new signatures, and a color which is split keeps the nodes before it
+        while True:
+            cells = {}
+            for node in nodes:
+                cells.setdefault(colors[node], []).append(node)
+            
+            refined = dict(colors)
+            for color, members in cells.items():
+                if len(members) == 1:
+                    continue
+                signatures = {node: (tuple(sorted((label, colors[end]) for label, end in outgoing[node])),
+                                     tuple(sorted((label, colors[start]) for label, start in incoming[node])),
+                                     tuple(tuple(sorted(colors[member] for member in classes.get(node, (node,)))) for classes in class_of))
+                              for node in members}
+                groups = {}
+                for node in members:
+                    groups.setdefault(signatures[node], []).append(node)
+                position = color
+                for signature in sorted(groups):
+                    for node in groups[signature]:
+                        refined[node] = position
+                    position += len(groups[signature])
+            
+            if len(set(refined.values())) == len(cells):
+                return colors
+            colors = refined
+    
+    first = None
+    best = None
+    automorphisms = []
+    
+    def leaf(colors, sequence):
+        """Handle a leaf of the search, and return the depth to return to, or None to continue"""
+        nonlocal first, best
+        
+        encoding = (node_count, colors[initial],
+                    tuple(tuple(sorted(tuple(sorted(colors[node] for node in members)) for members in partition)) for partition in partitions),
+                    tuple(sorted((colors[start], label, colors[end]) for start, label, end in edges)))
+        
+        for other in (first, best):
+            if other is not None and other[0] == encoding:
+                #the nodes with the same color in both leaves are mapped onto each other
+                node_of = {colors[node]: node for node in nodes}
+                automorphism = {}
+                for node in nodes:
+                    image = node_of[other[1][node]]
+                    if image is not node:
+                        automorphism[node] = image
+                automorphisms.append(automorphism)
+                
+                #the automorphism maps the path of the other leaf onto this path, so the rest of the
+                #subtree where they split has already been covered
+                if [colors[node] for node in sequence] == [other[1][node] for node in other[2]]:
+                    depth = 0
+                    while sequence[depth] is other[2][depth]:
+                        depth += 1
+                    return depth
+                return None
+        
+        if best is None or encoding < best[0]:
+            best = (encoding, colors, sequence)
+            if first is None:
+                first = best
+        return None
+    
+    def orbits(cell, sequence):
+        """Group the nodes of a cell by the orbits of the automorphisms found so far which fix the sequence"""
+        parent = {node: node for node in cell}
+        def find(node):
+            while parent[node] is not node:
+                node = parent[node]
+            return node
+        
+        for automorphism in automorphisms:
+            if any(node in automorphism for node in sequence):
+                continue
+            for node, image in automorphism.items():
+                if node in parent and image in parent:
+                    parent[find(node)] = find(image)
+        return find
+    
+    def search(colors, sequence):
+        """Search the subtree below a coloring, and return the depth to return to, or None to continue"""
+        cells = {}
+        for node in nodes:
+            cells.setdefault(colors[node], []).append(node)
+        shared = [color for color in cells if len(cells[color]) > 1]
+        
+        if not shared:
+            return leaf(colors, sequence)
+        
+        cell = cells[min(shared)]
+        explored = []
+        for node in cell:
+            if len(explored):
+                find = orbits(cell, sequence)
+                if find(node) in {find(other) for other in explored}:
+                    continue
+            explored.append(node)
+            
+            #the node is given the first position of its color
+            individualized = dict(colors)
+            for other in cell:
+                if other is not node:
+                    individualized[other] = colors[node] + 1
+            depth = search(refine(individualized), sequence + [node])
+            if depth is not None and depth < len(sequence):
+                return depth
+        return None
+    
+    search(refine({node: 0 if node is initial else 1 for node in nodes}), [])
+    return best[0]
+
 def powerset(iterable):
     """Generate the powerset of an iterable"""
     s = list(iterable)
     return chain.from_iterable(combinations(s, r) for r in range(1, len(s)+1))
     
+def _dot_string(value):
+    """Quote a string for a dot file, where newlines become the escape sequence for a newline"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\t", "    ").replace("\n", "\\n") + '"'
+
 def consistent(states):
     """Return the states in the previous multiplayer game which are consistent, given a set of transformed singleplayer states"""
     if not len(states) or len(states[0].knowledges) != 1:
@@ -87,14 +461,17 @@ def consistent(states):
         res = res.intersection(state[0])
     return res
     
-def iterate_until_isomorphic(G, limit=-1, print_size=False, verbose=True):
+def iterate_until_isomorphic(G, limit=-1, print_size=False, verbose=True, stats=None):
     """Iterate the MKBSC until the graph stabilizes or the limit is reached. Returns a log of graph sizes, the final game and whether the final game is stabilized
     
     G -- the game to begin with
     limit -- the maximum number of iterations. Use -1 (default) to remove the limit
     print_size -- if true, continuously prints the size of the graph
-    verbose -- if false, logs only the number of nodes in the graph"""
+    verbose -- if false, logs only the number of nodes in the graph
+    stats -- if given, a KBSCStats object which collects timings and counters from every iteration, see stats.py"""
     
+    if stats is None:
+        stats = NO_STATS
     
     current = G
     currentK = None
@@ -123,11 +500,16 @@ def iterate_until_isomorphic(G, limit=-1, print_size=False, verbose=True):
     p(0, len(G.states))
 
     while limit == -1 or i < limit:
-        currentK = current.KBSC()
+        currentK = current.KBSC(stats)
         i += 1
+        stats.count("iterations")
+        
+        with stats.phase("isomorphism"):
+            iso = len(current.states) == len(currentK.states) and current.isomorphic(currentK)
+            iso_observations = iso and current.isomorphic(currentK, consider_observations=True)
         
-        if len(current.states) == len(currentK.states) and current.isomorphic(currentK):
-            if current.isomorphic(currentK, consider_observations=True):
+        if iso:
+            if iso_observations:
                 last_iso = 2
                 p(i, len(currentK.states), 2)
                 break
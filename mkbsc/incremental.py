@@ -0,0 +1,91 @@
+from .stats import NO_STATS
+
+class IncrementalKBSC:
+    """Keeps the (M)KBSC of a game up to date while transitions and observations of the game are edited
+
+    Only the knowledge states which contain a state affected by an edit are explored again, the
+    transitions of the other knowledge states are copied from the previous result.
+
+    ex. inc = IncrementalKBSC(G)
+        GK = inc.game
+        GK2 = inc.update(added_transitions=[(0, ('w', 'p'), 2)])"""
+    
+    def __init__(self, base, stats=None):
+        """Apply the KBSC to the base game
+
+        stats -- if given, a KBSCStats object, see MultiplayerGame.KBSC()"""
+        
+        self.base = base
+        self.game = None
+        self._player_games = None
+        self._construct(None, stats)
+    
+    def update(self, added_transitions=(), removed_transitions=(), state_groupings=None, stats=None):
+        """Edit the base game and update its KBSC, which is returned
+
+        The arguments are the same as in MultiplayerGame.modify(). The edited game and its KBSC are
+        available as .base and .game afterwards"""
+        
+        base = self.base.modify(added_transitions, removed_transitions, state_groupings)
+        changed = _changed_states(self.base, base)
+        self.base = base
+        self._construct(changed, stats)
+        return self.game
+    
+    def _construct(self, changed, stats):
+        if stats is None:
+            stats = NO_STATS
+        
+        if self.base.player_count > 1:
+            games = []
+            for player in range(self.base.player_count):
+                with stats.phase("projection"):
+                    projection = self.base.project(player)
+                previous = self._player_games[player] if self._player_games else None
+                games.append(projection.KBSC(stats, previous, changed))
+            
+            self.game = self.base._synchronous_product(games, stats, self.game, changed)
+            self._player_games = games
+        else:
+            self.game = self.base.KBSC(stats, self.game, changed)
+
+def _changed_states(old, new):
+    """Return the states whose successors in the KBSC may differ between two versions of a game
+
+    That is the states whose outgoing transitions differ, and the states with a transition to a state
+    whose observation differs for some player"""
+    
+    def successors(game):
+        res = {}
+        for start, joint_action, end in game.transitions.triples():
+            if start in res:
+                res[start].add((joint_action, end))
+            else:
+                res[start] = {(joint_action, end)}
+        return res
+    
+    def observations(game):
+        res = {}
+        for player, partitioning in enumerate(game.partitionings):
+            for observation in partitioning:
+                states = frozenset(observation)
+                for state in observation:
+                    res[(player, state)] = states
+        return res
+    
+    moved = set()
+    if old.partitionings is not new.partitionings:
+        old_observations = observations(old)
+        for key, states in observations(new).items():
+            if old_observations.get(key) != states:
+                moved.add(key[1])
+    
+    old_successors = successors(old)
+    new_successors = successors(new)
+    changed = set()
+    for state in set(old_successors).union(new_successors):
+        edges = new_successors.get(state, set())
+        if edges != old_successors.get(state, set()) or any(end in moved for action, end in edges):
+            changed.add(state)
+    
+    return changed
@@ -0,0 +1,95 @@
+import glob, os
+
+from .serialization import from_file
+
+class IsomorphismIndex:
+    """An index on disk from the certificates of games to the files they are saved in
+
+    Looking up a game finds the files of the isomorphic games in the index without comparing the
+    game to each of them, see MultiplayerGame.certificate(). The index is an SQLite database, and
+    changes are saved by .commit(), or when the index is closed.
+
+    ex. with IsomorphismIndex("games/random.db") as index:
+            for i, game in enumerate(MultiplayerGame.generate_random(100000, 2, 4, 2, 24, [1, 1], [(2, 2), (2, 2)])):
+                if game not in index:
+                    to_file(game, "random" + str(i), "games/random")
+                    index.add(game, "random" + str(i))"""
+
+    def __init__(self, filename, consider_observations=True):
+        """Open or create an index
+
+        consider_observations -- if true, games are only isomorphic if their observations are. Must be
+                                 the same every time the index is opened"""
+        import sqlite3
+
+        self.consider_observations = consider_observations
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS games (certificate TEXT NOT NULL, file TEXT NOT NULL, UNIQUE (certificate, file))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS games_by_certificate ON games (certificate)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+
+        self.connection.execute("INSERT OR IGNORE INTO settings VALUES ('consider_observations', ?)", (str(consider_observations),))
+        stored = self.connection.execute("SELECT value FROM settings WHERE key = 'consider_observations'").fetchone()[0]
+        if stored != str(consider_observations):
+            self.connection.close()
+            raise ValueError("The index was created with consider_observations=" + stored)
+
+    def certificate(self, game):
+        """Get the certificate of a game with the settings of the index"""
+        return game.certificate(self.consider_observations)
+
+    def add(self, game, file, certificate=None):
+        """Add a game saved in a file to the index, and return the files of the isomorphic games which
+        were already in the index
+
+        certificate -- the certificate of the game, if it is already known"""
+
+        if certificate is None:
+            certificate = self.certificate(game)
+
+        files = self.lookup(certificate=certificate)
+        self.connection.execute("INSERT OR IGNORE INTO games VALUES (?, ?)", (certificate, file))
+        return [f for f in files if f != file]
+
+    def lookup(self, game=None, certificate=None):
+        """Get the files of the games in the index which are isomorphic to a game, or have a certain certificate"""
+
+        if certificate is None:
+            certificate = self.certificate(game)
+        return [row[0] for row in self.connection.execute("SELECT file FROM games WHERE certificate = ? ORDER BY file", (certificate,))]
+
+    def __contains__(self, game):
+        """Check if a game isomorphic to the given one is in the index"""
+        return self.connection.execute("SELECT 1 FROM games WHERE certificate = ? LIMIT 1", (self.certificate(game),)).fetchone() is not None
+
+    def __len__(self):
+        """Get the number of files in the index"""
+        return self.connection.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def add_folder(self, folder="games", fileext=".game", validate=False):
+        """Add every game file in a folder to the index, where files are stored without the extension as in from_file()
+
+        Returns a dict from every file which is isomorphic to a game already in the index, to the
+        files of those games"""
+
+        duplicates = {}
+        for path in sorted(glob.glob(os.path.join(glob.escape(folder), "*" + fileext))):
+            file = os.path.basename(path)[:-len(fileext)] if fileext else os.path.basename(path)
+            isomorphic = self.add(from_file(file, folder, fileext, validate), file)
+            if isomorphic:
+                duplicates[file] = isomorphic
+        return duplicates
+
+    def commit(self):
+        """Save the changes to the index"""
+        self.connection.commit()
+
+    def close(self):
+        """Save the changes and close the index"""
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
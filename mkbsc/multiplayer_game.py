@@ -2,18 +2,19 @@ from .alphabet          import Alphabet
 from .state             import State
 from .observation       import Observation
 from .partitioning      import Partitioning
-from .transition        import Transition
-from .helper_functions  import _permute, _lookup, _lookup_by_base, _reachable, consistent, powerset
+from .transition        import Transition, TransitionTable, _label
+from .helper_functions  import _permute, _lookup, _base_index, _lookup_by_base, _reachable, _coarsest_bisimulation, _previous_successors, _number_states, _narrow, _partition_isomorphic, _partition_matcher, _canonical_encoding, _dot_string, consistent, powerset
 
-#import threading
-#import time
-from itertools          import chain, combinations, permutations
-from collections        import deque
-from random             import shuffle, sample, randint
+from .stats             import NO_STATS
+from .symmetry          import Symmetry, _closure, _orbit_representative
 
-import networkx as nx
-from networkx.algorithms.isomorphism    import is_isomorphic
-from networkx.drawing.nx_pydot          import to_pydot
+from itertools          import chain, combinations, permutations, product
+from collections        import deque
+from array              import array
+from heapq              import heappush, heappop
+from random             import Random
+from string             import ascii_lowercase, ascii_uppercase
+from json               import dumps, loads
 
 
 class MultiplayerGame:
@@ -25,16 +26,22 @@ class MultiplayerGame:
     game as a dot string."""
     
     def __init__(self, states, initial_state, alphabet, transitions, partitionings, remove_unreachable=False, validate=False, **attributes):
-        """Create a new game and optionally validate and remove unreachable states."""
+        """Create a new game and optionally validate and remove unreachable states.
+
+        The unreachable states are removed before the game is constructed, so the states, transitions,
+        partitionings and graph of the game always agree."""
+        
+        if remove_unreachable:
+            states, transitions, partitionings = MultiplayerGame._restrict_to_reachable(states, initial_state, transitions, partitionings)
         
         self.states = states
         self.initial_state = initial_state
         self.alphabet = alphabet
-        self.transitions = transitions
         self.partitionings = partitionings
+        self._base_lookup = None
+        self._graph = None
         
-        self.graph = nx.MultiDiGraph()
-        self.graph.graph["graph"] = attributes
+        self.attributes = attributes
         default_attributes = {
             #"rankdir": "LR",
             "nodesep": 0.5,
@@ -43,32 +50,80 @@ class MultiplayerGame:
             "splines": "True"
         }
         for key in default_attributes:
-            if key not in self.graph.graph["graph"]:
-                self.graph.graph["graph"][key] = default_attributes[key]
+            if key not in self.attributes:
+                self.attributes[key] = default_attributes[key]
         
         self.player_count = len(alphabet)
         
         assert len(partitionings) == self.player_count
         
         if validate:
+            state_set = set(states)
             for partitioning in partitionings:
-                assert partitioning.valid(states)
+                assert partitioning.valid(state_set)
+            
+            triples = transitions.triples() if type(transitions) is TransitionTable else \
+                ((transition.start, transition.joint_action, transition.end) for transition in transitions)
+            for start, joint_action, end in triples:
+                assert start in state_set and end in state_set
+                for i, action in enumerate(joint_action):
+                    assert action in self.alphabet[i]
         
+        if type(transitions) is not TransitionTable:
+            transitions = TransitionTable(alphabet, transitions)
         for state in states:
-            self.graph.add_node(state)
+            transitions.add_state(state)
+        self.transitions = transitions
+
+    @property
+    def graph(self):
+        """The game as a networkx MultiDiGraph, which is constructed the first time it is used"""
+        import networkx as nx
+        
+        if self._graph is None:
+            graph = nx.MultiDiGraph()
+            graph.graph["graph"] = self.attributes
+            graph.add_nodes_from(self.states)
+            for start, joint_action, end in self.transitions.triples():
+                graph.add_edge(start, end, label=_label(joint_action), key=joint_action, action=joint_action)
+            self._graph = graph
+        return self._graph
+
+    def _restrict_to_reachable(states, initial_state, transitions, partitionings):
+        """Return the states, transitions and partitionings restricted to the states reachable from the initial state"""
+        
+        successors = {}
         for transition in transitions:
-            if validate:
-                assert transition.start in states and transition.end in states
-                for i, action in enumerate(transition.joint_action):
-                    assert action in self.alphabet[i]
-                    
-            self.graph.add_edge(transition.start, transition.end,
-                label=transition.label(), key=transition.joint_action, action=transition.joint_action)
-                
-        if remove_unreachable:
-            to_remove = (set(self.states) - _reachable(self.graph, self.initial_state)) - {self.initial_state}
-            #print("Removing " + str(to_remove))
-            self.graph.remove_nodes_from(to_remove)
+            if transition.start in successors:
+                successors[transition.start].append(transition.end)
+            else:
+                successors[transition.start] = [transition.end]
+        
+        reachable = {initial_state}
+        queue = deque([initial_state])
+        while len(queue):
+            for state in successors.get(queue.pop(), ()):
+                if state not in reachable:
+                    reachable.add(state)
+                    queue.appendleft(state)
+        
+        if len(reachable) == len(states):
+            return states, transitions, partitionings
+        
+        states = tuple(state for state in states if state in reachable)
+        transitions = tuple(transition for transition in transitions if transition.start in reachable)
+        
+        restricted = []
+        for partitioning in partitionings:
+            observations = []
+            for observation in partitioning:
+                if all(state in reachable for state in observation):
+                    observations.append(observation)
+                elif any(state in reachable for state in observation):
+                    observations.append(Observation(*[state for state in observation if state in reachable]))
+            restricted.append(Partitioning(*observations))
+        
+        return states, transitions, tuple(restricted)
             
     def create(content, initial, alphabet, transition_edges, state_groupings, **attributes):
         """Create a new game and validate it
@@ -80,11 +135,30 @@ class MultiplayerGame:
         state_groupings -- the observation partitionings, ex. ([[1, 2], [3]], [[1], [2, 3]])"""
         
         states = tuple(set(map(lambda x: State(x), content)))
-        initial_state = _lookup(states, initial)
+        lookup = MultiplayerGame._lookup_function(states)
+        
+        initial_state = lookup(initial)
         
         if type(alphabet) is not Alphabet:
             alphabet = Alphabet(*alphabet)
         
+        transitions = MultiplayerGame._transitions_from_edges(lookup, alphabet, transition_edges)
+        partitionings = MultiplayerGame._partitionings_from_groupings(lookup, states, state_groupings)
+        
+        return MultiplayerGame(states, initial_state, alphabet, transitions, partitionings, False, True, **attributes)
+
+    def _lookup_function(states):
+        """Return a function which finds the base state with the specified knowledge"""
+        state_dict = {state.knowledges[0]: state for state in states}
+        def lookup(knowledge):
+            try:
+                return state_dict[knowledge]
+            except (KeyError, TypeError):
+                raise KeyError("Could not find a matching state")
+        return lookup
+    
+    def _transitions_from_edges(lookup, alphabet, transition_edges):
+        """Create the transitions from edges in the format of create()"""
         transitions = []
         expanded_edges = []
         for edge_iterable in [transition_edges, expanded_edges]:
@@ -94,17 +168,18 @@ class MultiplayerGame:
                         expanded_edges.append((edge[0], edge[1], edge_end))
                     continue
                         
-                start = _lookup(states, edge[0])
-                end = _lookup(states, edge[2])
+                start = lookup(edge[0])
+                end = lookup(edge[2])
                 if edge[1] == Ellipsis:
-                    for joint_action in alphabet.permute():
+                    for joint_action in alphabet.joint_actions:
                         transitions.append(Transition(start, joint_action, end))
                 else:
                     transitions.append(Transition(start, edge[1], end))
             
-        transitions = tuple(transitions)
-
-
+        return tuple(transitions)
+    
+    def _partitionings_from_groupings(lookup, states, state_groupings):
+        """Create the partitionings from state groupings in the format of create()"""
         partitionings = []
         for grouping in state_groupings:
             observations = []
@@ -113,7 +188,7 @@ class MultiplayerGame:
                 if group == Ellipsis:
                     ellipsis = True
                     continue
-                observations.append(Observation(*[_lookup(states, s) for s in group]))
+                observations.append(Observation(*[lookup(s) for s in group]))
             if ellipsis:
                 covered_states = set()
                 for observation in observations:
@@ -125,51 +200,111 @@ class MultiplayerGame:
             
             partitionings.append(Partitioning(*observations))
         
-        partitionings = tuple(partitionings)
+        return tuple(partitionings)
+
+    def modify(self, added_transitions=(), removed_transitions=(), state_groupings=None):
+        """Return a copy of a base game with some transitions added or removed, or with new observations
+
+        The copy shares the state objects with this game, which lets IncrementalKBSC reuse the
+        knowledge states that are not affected by the changes.
+
+        added_transitions -- edges to add, in the format of create(), ex. [(1, ('a', '1'), 2)]
+        removed_transitions -- edges to remove, in the same format
+        state_groupings -- if given, replaces the observation partitionings, in the format of create()"""
         
+        lookup = MultiplayerGame._lookup_function(self.states)
         
-        return MultiplayerGame(states, initial_state, alphabet, transitions, partitionings, False, True, **attributes)
+        removed = {(t.start, t.joint_action, t.end) for t in MultiplayerGame._transitions_from_edges(lookup, self.alphabet, removed_transitions)}
+        transitions = [t for t in self.transitions if (t.start, t.joint_action, t.end) not in removed]
+        
+        existing = {(t.start, t.joint_action, t.end) for t in transitions}
+        for t in MultiplayerGame._transitions_from_edges(lookup, self.alphabet, added_transitions):
+            if (t.start, t.joint_action, t.end) not in existing:
+                existing.add((t.start, t.joint_action, t.end))
+                transitions.append(t)
+        
+        partitionings = self.partitionings
+        if state_groupings is not None:
+            partitionings = MultiplayerGame._partitionings_from_groupings(lookup, self.states, state_groupings)
+        
+        attributes = self.attributes
+        
+        return MultiplayerGame(self.states, self.initial_state, self.alphabet, tuple(transitions), partitionings, False, True, **attributes)
 
-    def _generate_observation_partition(num_non_singleton_obs, non_singleton_obs_range, states):
+    def _generate_observation_partition(num_non_singleton_obs, non_singleton_obs_range, states, rng):
         random_states = states.copy()
-        shuffle(random_states)
+        rng.shuffle(random_states)
 
         O = []
         for i in range(num_non_singleton_obs):
-            obs_size = randint(non_singleton_obs_range[0], non_singleton_obs_range[1])
+            obs_size = rng.randint(non_singleton_obs_range[0], non_singleton_obs_range[1])
             O.append(random_states[:obs_size])
             random_states = random_states[obs_size:]
 
         for s in random_states:
-            O.append(list(s))
+            O.append([s])
 
         return O
 
-    def create_random(num_players, num_states, num_actions, num_transitions, num_non_singleton_obs, non_singleton_obs_ranges):
-        possible_L = ["a","b","c","d","e","f","g","h","i","j","k","l","m","n","o","p","q","r","s","t","u","v","w","x","y","z"]
-        possible_Sigma = ["A","B","C","D","E","F","G","H","I","J","K","L","M","N","O","P","Q","R","S","T","U","V","W","X","Y","Z"]
+    def _generate_names(count, letters):
+        """Generate distinct names from the letters, ex. a, b, ..., z, aa, ab, ..."""
+        names = []
+        length = 1
+        while len(names) < count:
+            for name in product(letters, repeat=length):
+                names.append("".join(name))
+                if len(names) == count:
+                    break
+            length += 1
+        return names
 
-        L = possible_L[:num_states]
-        L0 = sample(L, 1)[0]
-        Sigma = possible_Sigma[:num_actions]
+    def create_random(num_players, num_states, num_actions, num_transitions, num_non_singleton_obs, non_singleton_obs_ranges, seed=None):
+        """Create a random game
 
-        possible_Delta = [()]
-        for i in range(num_players):
-            possible_Delta = [tuple(list(d) + [s]) for s in Sigma for d in possible_Delta]
+        The transitions are sampled without replacement from the |L|^2 * |Sigma|^num_players possible
+        transitions, without generating the possible transitions.
 
-        possible_Delta = [(l1, d, l2) for l1 in L for l2 in L for d in possible_Delta]
+        num_non_singleton_obs -- the number of non-singleton observations of each player
+        non_singleton_obs_ranges -- the (inclusive) range of the size of the non-singleton observations of each player
+        seed -- the seed of the random number generator. Games created with the same arguments and seed are the same"""
 
-        Sigma = (Sigma,) * num_players
+        rng = Random(seed)
+
+        L = MultiplayerGame._generate_names(num_states, ascii_lowercase)
+        L0 = rng.choice(L)
+        Sigma = MultiplayerGame._generate_names(num_actions, ascii_uppercase)
+
+        #every possible transition is numbered in a mixed radix system, (l1, action_0, ..., action_n-1, l2)
+        num_possible = num_states ** 2 * num_actions ** num_players
 
-        shuffle(possible_Delta)
-        Delta = possible_Delta[:num_transitions]
+        Delta = []
+        for index in rng.sample(range(num_possible), min(num_transitions, num_possible)):
+            index, l2 = divmod(index, num_states)
+            joint_action = []
+            for i in range(num_players):
+                index, action = divmod(index, num_actions)
+                joint_action.append(Sigma[action])
+            Delta.append((L[index], tuple(joint_action), L[l2]))
+
+        Sigma = (Sigma,) * num_players
 
         Obs = []
         for i in range(num_players):
-            Obs.append(MultiplayerGame._generate_observation_partition(num_non_singleton_obs[i], non_singleton_obs_ranges[i], L))
+            Obs.append(MultiplayerGame._generate_observation_partition(num_non_singleton_obs[i], non_singleton_obs_ranges[i], L, rng))
 
         return MultiplayerGame.create(L, L0, Sigma, Delta, Obs)
 
+    def generate_random(count, num_players, num_states, num_actions, num_transitions, num_non_singleton_obs, non_singleton_obs_ranges, seed=None):
+        """Generate random games one at a time, see create_random()
+
+        The games are reproducible given the seed, and can be written to disk as they are generated
+        with to_files() in serialization.py, ex. to_files(MultiplayerGame.generate_random(1000, ...), "random")"""
+
+        rng = Random(seed)
+        for i in range(count):
+            yield MultiplayerGame.create_random(num_players, num_states, num_actions, num_transitions,
+                                                num_non_singleton_obs, non_singleton_obs_ranges, seed=rng.getrandbits(64))
+
     def stable(self):
         if (self.isomorphic(self.KBSC(), consider_observations=True)):
             return True
@@ -203,33 +338,259 @@ class MultiplayerGame:
         
         return MultiplayerGame(states, initial_state, alphabet, transitions, partitionings, False, validate, **attributes)
         
+    def __reduce__(self):
+        """Pickle the game as arrays of state ids, see _encode()"""
+        return (MultiplayerGame._decode, MultiplayerGame._encode(self))
+    
+    def _encode(game):
+        """Encode a game as arrays of ids and the few Python objects they refer to
+
+        The states, and the states in their knowledge, are numbered as in serialization.to_string().
+        The knowledge states, observations and transitions are flat arrays of ids, where the ends of
+        each knowledge and each observation are given by the arrays ending in "ends".
+        Each array uses the smallest integer type which can hold its values.
+        Returns (arrays, objects), the arguments of _decode()"""
+        
+        base_states, knowledge_states, state_ids = _number_states(game)
+        
+        knowledges = array("l")
+        knowledge_ends = array("l")
+        state_ends = array("l")
+        for state in knowledge_states:
+            for knowledge in state.knowledges:
+                knowledges.extend(state_ids[s] for s in knowledge)
+                knowledge_ends.append(len(knowledges))
+            state_ends.append(len(knowledge_ends))
+        
+        observations = array("l")
+        observation_ends = array("l")
+        partitioning_ends = array("l")
+        for partitioning in game.partitionings:
+            for observation in partitioning:
+                observations.extend(state_ids[s] for s in observation)
+                observation_ends.append(len(observations))
+            partitioning_ends.append(len(observation_ends))
+        
+        table = game.transitions
+        arrays = {
+            "states": array("l", (state_ids[s] for s in game.states)),
+            "knowledges": knowledges,
+            "knowledge ends": knowledge_ends,
+            "state ends": state_ends,
+            "observations": observations,
+            "observation ends": observation_ends,
+            "partitioning ends": partitioning_ends,
+            "table states": array("l", (state_ids[s] for s in table.states)),
+            "sources": array("l", table.sources),
+            "actions": array("l", table.actions),
+            "targets": array("l", table.targets)
+        }
+        for key in arrays:
+            arrays[key] = _narrow(arrays[key])
+        objects = {
+            "base values": [state[0] for state in base_states],
+            "initial state": state_ids[game.initial_state],
+            "alphabet": game.alphabet.actions,
+            "attributes": game.attributes
+        }
+        return arrays, objects
+    
+    def _decode(arrays, objects):
+        """Create a game from the output of _encode()
+
+        The arrays can be any sequences of integers, such as memoryviews of shared memory. The
+        transitions of the game refer to the arrays directly, without copying them"""
+        
+        states = [State(value) for value in objects["base values"]]
+        
+        knowledges = arrays["knowledges"]
+        knowledge_ends = arrays["knowledge ends"]
+        start = 0
+        knowledge_start = 0
+        for state_end in arrays["state ends"]:
+            knowledge = []
+            for end in knowledge_ends[knowledge_start:state_end]:
+                knowledge.append(frozenset(states[i] for i in knowledges[start:end]))
+                start = end
+            knowledge_start = state_end
+            states.append(State(*knowledge))
+        
+        observations = arrays["observations"]
+        observation_ends = arrays["observation ends"]
+        partitionings = []
+        start = 0
+        observation_start = 0
+        for partitioning_end in arrays["partitioning ends"]:
+            partitioning = []
+            for end in observation_ends[observation_start:partitioning_end]:
+                partitioning.append(Observation(*[states[i] for i in observations[start:end]]))
+                start = end
+            observation_start = partitioning_end
+            partitionings.append(Partitioning(*partitioning))
+        
+        alphabet = Alphabet(*objects["alphabet"])
+        table = TransitionTable(alphabet)
+        for i in arrays["table states"]:
+            table.add_state(states[i])
+        table.sources = arrays["sources"]
+        table.actions = arrays["actions"]
+        table.targets = arrays["targets"]
+        
+        game_states = tuple(states[i] for i in arrays["states"])
+        initial_state = states[objects["initial state"]]
+        
+        return MultiplayerGame(game_states, initial_state, alphabet, table, tuple(partitionings), **dict(objects["attributes"]))
+    
+    def to_arrays(self, parent=None):
+        """Export the game as a dict of NumPy arrays
+
+        The states are numbered by their position in self.states, and the joint actions by their ids
+        in the alphabet. The successors of state i with joint action a are
+        action_indices[action_indptr[a, i]:action_indptr[a, i + 1]], so each joint action has a CSR
+        adjacency matrix with the index pointer action_indptr[a] - action_indptr[a, 0]. The arrays are:
+        
+        initial_state -- the id of the initial state
+        action_indptr, action_indices -- the transitions, as above
+        joint_actions -- joint_actions[a, player] is the id of the player's action in joint action a
+        observations -- observations[player, i] is the number of the observation containing state i
+        membership_indptr, membership_indices -- only for knowledge-based games: the knowledge of
+                                                 player p in state i is the states of the previous game
+                                                 with ids membership_indices[membership_indptr[p, i]:membership_indptr[p, i + 1]]
+        parent_count -- only for knowledge-based games: the number of states of the previous game
+        meta -- a JSON string with the alphabet, the attributes and, for base games, the states' values
+        
+        parent -- the game this game is the KBSC of, whose order of states numbers the states of the previous
+                  game. By default they are numbered in the order they are first found in the knowledge"""
+        import numpy as np
+        
+        n = len(self.states)
+        ids = {state: i for i, state in enumerate(self.states)}
+        table = self.transitions
+        action_count = len(self.alphabet.joint_actions)
+        
+        state_map = np.array([ids[state] for state in table.states], dtype=np.int64)
+        sources = state_map[np.asarray(table.sources, dtype=np.int64)]
+        actions = np.asarray(table.actions, dtype=np.int64)
+        targets = state_map[np.asarray(table.targets, dtype=np.int64)]
+        
+        order = np.lexsort((targets, sources, actions))
+        counts = np.bincount(actions * n + sources, minlength=action_count * n)
+        offsets = np.zeros(action_count * n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        
+        arrays = {
+            "initial_state": np.array(ids[self.initial_state]),
+            "action_indptr": np.stack([offsets[a * n:(a + 1) * n + 1] for a in range(action_count)]) if action_count else np.zeros((0, n + 1), dtype=np.int64),
+            "action_indices": targets[order],
+            "joint_actions": np.array(self.alphabet.components, dtype=np.int64).T.reshape(action_count, self.player_count),
+            "observations": np.zeros((self.player_count, n), dtype=np.int64)
+        }
+        for player, partitioning in enumerate(self.partitionings):
+            for number, observation in enumerate(partitioning):
+                for state in observation:
+                    arrays["observations"][player, ids[state]] = number
+        
+        meta = {"alphabet": self.alphabet.actions, "attributes": self.attributes}
+        if type(self.initial_state[0]) is frozenset:
+            if parent is not None:
+                parent_ids = {state: i for i, state in enumerate(parent.states)}
+            else:
+                parent_ids = {}
+                for state in self.states:
+                    for knowledge in state.knowledges:
+                        for s in knowledge:
+                            parent_ids.setdefault(s, len(parent_ids))
+            
+            indptr = np.zeros((self.player_count, n + 1), dtype=np.int64)
+            indices = []
+            for player in range(self.player_count):
+                indptr[player, 0] = len(indices)
+                for i, state in enumerate(self.states):
+                    indices.extend(sorted(parent_ids[s] for s in state[player]))
+                    indptr[player, i + 1] = len(indices)
+            arrays["membership_indptr"] = indptr
+            arrays["membership_indices"] = np.array(indices, dtype=np.int64)
+            arrays["parent_count"] = np.array(len(parent_ids))
+        else:
+            meta["values"] = [state[0] for state in self.states]
+        arrays["meta"] = np.array(dumps(meta))
+        
+        return arrays
+    
+    def from_arrays(arrays, parent=None):
+        """Create a game from the arrays of to_arrays()
+
+        parent -- the game whose states are the knowledge of the states of a knowledge-based game. By
+                  default, the knowledge is made up of new base states whose values are their ids"""
+        import numpy as np
+        
+        meta = loads(str(arrays["meta"]))
+        alphabet = Alphabet(*meta["alphabet"])
+        observations = np.asarray(arrays["observations"])
+        player_count, n = observations.shape
+        
+        if "membership_indptr" in arrays:
+            parent_states = parent.states if parent is not None else [State(i) for i in range(int(arrays["parent_count"]))]
+            indptr = np.asarray(arrays["membership_indptr"]).tolist()
+            indices = np.asarray(arrays["membership_indices"]).tolist()
+            states = [State(*[frozenset(parent_states[j] for j in indices[indptr[player][i]:indptr[player][i + 1]]) for player in range(player_count)]) for i in range(n)]
+        else:
+            states = [State(value) for value in meta["values"]]
+        
+        indptr = np.asarray(arrays["action_indptr"])
+        counts = np.diff(indptr, axis=1)
+        sources = np.repeat(np.tile(np.arange(n), len(indptr)), counts.ravel())
+        actions = np.repeat(np.arange(len(indptr)), counts.sum(axis=1))
+        targets = np.asarray(arrays["action_indices"])
+        
+        table = TransitionTable(alphabet)
+        for state in states:
+            table.add_state(state)
+        for column, values in ((table.sources, sources), (table.actions, actions), (table.targets, targets)):
+            column.frombytes(values.astype(np.dtype("l")).tobytes())
+        
+        partitionings = []
+        for player in range(player_count):
+            groups = {}
+            for i, number in enumerate(observations[player].tolist()):
+                groups.setdefault(number, []).append(states[i])
+            partitionings.append(Partitioning(*[Observation(*groups[number]) for number in sorted(groups)]))
+        
+        return MultiplayerGame(tuple(states), states[int(arrays["initial_state"])], alphabet, table, tuple(partitionings), **meta["attributes"])
+    
     def state(self, knowledge):
         """Get the state object with the specified knowledge"""
         return _lookup(self.states, knowledge, len(self.states[0].knowledges) == 1)
     
     def states_by_consistent_base(self, base):
         """Get the state objects which represent the specified base states"""
-        return _lookup_by_base(self.states, base)
+        return _lookup_by_base(self._base_index(), base)
+
+    def _target_states(self, target_states):
+        """Get the set of states specified by states or consistent bases, see to_dot()"""
+        res = set()
+        for target in target_states:
+            if type(target) is State:
+                res.add(target)
+            else:
+                res.update(self.states_by_consistent_base(target))
+        return res
+
+    def _base_index(self):
+        """Get the index of the states by their consistent base, building it on first use"""
+        if self._base_lookup is None:
+            self._base_lookup = _base_index(self.states)
+        return self._base_lookup
     
     def post(self, action, states):
         """Get the states that are possible after taking a certain action in one of the specified states"""
         
-        res = set()
         if self.player_count == 1:
             action = (action,)
         if not hasattr(states, '__iter__'):
             states = (states,)
-            
-        for state in states:
-            neighbors = self.graph.neighbors(state)
-            for neighbor in neighbors:
-                edges = self.graph[state][neighbor]
-                for key in edges:
-                    if edges[key]["action"] == action:
-                        res.add(neighbor)
-                        break
         
-        return res
+        return self.transitions.post(tuple(action), states)
 
     def reachable(self, initial=None):
         """Get the reachable states in a game, optionally given a certain initial state"""
@@ -238,7 +599,7 @@ class MultiplayerGame:
         if not initial:
             initial = self.initial_state
             res.add(self.initial_state)
-        return res.union(_reachable(self.graph, initial))
+        return res.union(_reachable(self.transitions, initial))
         
     def to_dot(self, group_observations=None, group_by_base=False, group_edges=True, epistemic=False, \
                supress_edges=False, color_scheme="set19", colorfunc=lambda x:x+1, observations_constrain=True, \
@@ -254,6 +615,8 @@ class MultiplayerGame:
         colorfunc -- a function which numbers the players from 1 to be used with the color scheme, or provides the color directly
         observations_constrain -- if false, ignores the observation equivalence relations when generating the graph layout
         target_states -- the states (or singleton knowledge in states) which should be marked in the rendered graph"""
+        import networkx as nx
+        from networkx.drawing.nx_pydot import to_pydot
         
         G = self.graph.copy()
         # Define width of lines
@@ -262,11 +625,11 @@ class MultiplayerGame:
 
 
         
-        all_joint_actions = set(self.alphabet.permute())
+        all_joint_actions = set(self.alphabet.joint_actions)
         
         if group_edges:
             for node in G:
-                for neighbor in G.neighbors(node):
+                for neighbor in list(G.neighbors(node)):
                     edges = [edge for edge in G.edges(node, data=True) if edge[1] == neighbor]
                     if len(edges) == 1:
                         continue
@@ -314,10 +677,7 @@ class MultiplayerGame:
         G.add_edge("hidden", self.initial_state)
 
         if target_states:
-            for i in range(len(target_states)):
-                if type(target_states[i]) is not State:
-                    target_states[i:i+1] = _lookup_by_base(self.states, target_states[i])
-            for target_state in target_states:
+            for target_state in self._target_states(target_states):
                 G.nodes[target_state]["shape"] = "doublecircle"
 
         #if group_observations is None:
@@ -342,12 +702,7 @@ class MultiplayerGame:
             arr = to_pydot(G).to_string().split("\n")
                 
             if group_by_base:
-                groups = {}
-                for state in self.states:
-                    fs = frozenset(state.consistent_base())
-                    if fs not in groups:
-                        groups[fs] = set()
-                    groups[fs].add(state)
+                groups = self._base_index()[0]
                 
                 #print(groups.keys())
                 
@@ -362,6 +717,105 @@ class MultiplayerGame:
             State.compact_representation = False
             return "\n".join(arr)
     
+    def to_dot_summary(self, collapse="observations", player=0, expand=None, max_labels=3, epistemic="isocheck",
+                       target_states=None, layout="auto", sfdp_threshold=500, color_scheme="set19", colorfunc=lambda x:x+1, **kwargs):
+        """Generate a dot representation of the game where groups of states are collapsed into summary nodes
+        
+        Meant for games which are too large for to_dot() and Graphviz. Each group is drawn as a single node
+        labeled with its number of states, and the edges between two nodes are combined into one, labeled
+        with at most max_labels joint actions. The dot string is written directly from the transition table,
+        without constructing the graph of the game.
+        
+        collapse -- "observations" to collapse the observations of a player, "base" to collapse the states
+                    with the same consistent base, or None to draw every state
+        player -- the player whose observations are collapsed
+        expand -- the states (or singleton knowledge in states) whose groups are drawn state by state, with the
+                  observations between their states drawn as dashed edges
+        max_labels -- the maximum number of joint actions in the label of an edge, and 0 for no labels
+        epistemic -- 'verbose', 'nice' or 'isocheck', how to label the states which are drawn
+        target_states -- the states (or singleton knowledge in states) which should be marked
+        layout -- the Graphviz layout engine, or "auto" to use sfdp when more than sfdp_threshold nodes are drawn
+        kwargs -- attributes of the graph, which override those of the game"""
+        
+        epistemic_functions = {"verbose": State.epistemic_verbose, "nice": State.epistemic_nice, "isocheck": State.epistemic_isocheck}
+        func = epistemic_functions[epistemic.lower()]
+        
+        table = self.transitions
+        
+        if collapse == "observations":
+            groups = [(observation.states, "") for observation in self.partitionings[player]]
+        elif collapse == "base":
+            groups = [(states, ", ".join(sorted([str(state.knowledges[0]) for state in base]))) for base, states in self._base_index()[0].items()]
+        elif collapse is None:
+            groups = [((state,), "") for state in self.states]
+        else:
+            raise ValueError("Unknown collapse: " + str(collapse))
+        
+        expanded = self._target_states(expand) if expand else set()
+        targets = self._target_states(target_states) if target_states else set()
+        
+        #every state is drawn by its own node or the node of its group
+        nodes = []
+        collapsed = set()
+        node_of = [None] * len(table.states)
+        for group, label in groups:
+            if len(group) == 1 or not expanded.isdisjoint(group):
+                for state in group:
+                    node_of[table.state_ids[state]] = len(nodes)
+                    nodes.append("s{0} [label={1}{2}];".format(len(nodes), _dot_string(func(state)), ", shape=doublecircle" if state in targets else ""))
+            else:
+                for state in group:
+                    node_of[table.state_ids[state]] = len(nodes)
+                label = (label + "\n" if label else "") + str(len(group)) + " states"
+                collapsed.add(len(nodes))
+                nodes.append("s{0} [label={1}, shape=box, style=rounded{2}];".format(len(nodes), _dot_string(label), ", peripheries=2" if not targets.isdisjoint(group) else ""))
+        
+        edges = {}
+        for source, action, target in zip(table.sources, table.actions, table.targets):
+            key = (node_of[source], node_of[target])
+            if key in edges:
+                edges[key].add(action)
+            else:
+                edges[key] = {action}
+        
+        joint_action_count = len(self.alphabet.joint_actions)
+        lines = []
+        for (start, end), actions in edges.items():
+            attributes = []
+            if max_labels:
+                if len(actions) == joint_action_count and joint_action_count > 1:
+                    label = "(-)"
+                else:
+                    labels = [_label(table.joint_actions[action]) for action in sorted(actions)]
+                    label = ", ".join(labels[:max_labels])
+                    if len(labels) > max_labels:
+                        label += ", +" + str(len(labels) - max_labels)
+                attributes.append("label=" + _dot_string(label))
+            if start == end:
+                attributes.append("dir=back")
+            lines.append("s{0} -> s{1}{2};".format(start, end, " [" + ", ".join(attributes) + "]" if attributes else ""))
+        
+        #observations between drawn states are chained rather than connected pairwise
+        for i, partitioning in enumerate(self.partitionings):
+            for observation in partitioning:
+                drawn = sorted(set(node_of[table.state_ids[state]] for state in observation) - collapsed)
+                for start, end in zip(drawn, drawn[1:]):
+                    lines.append("s{0} -> s{1} [style=dashed, arrowhead=none, constraint=false, colorscheme={2}, color={3}{4}];".format(
+                        start, end, color_scheme, colorfunc(i), ", label=" + _dot_string("~" + str(i)) if self.player_count > 1 else ""))
+        
+        attributes = dict(self.attributes)
+        if layout == "auto":
+            layout = "sfdp" if len(nodes) > sfdp_threshold else None
+        if layout:
+            attributes["layout"] = layout
+            if layout == "sfdp":
+                attributes.update({"overlap": "prism", "splines": "false", "outputorder": "edgesfirst"})
+        attributes.update(kwargs)
+        
+        header = ["digraph {"] + ["{0}={1};".format(key, _dot_string(str(value).lower() if type(value) is bool else str(value))) for key, value in attributes.items()]
+        initial = ["hidden [shape=none, label=\"\"];", "hidden -> s{0};".format(node_of[table.state_ids[self.initial_state]])]
+        return "\n".join(header + nodes + initial + lines + ["}"]) + "\n"
+    
     def project(self, player):
         """Project the game onto a player"""
         
@@ -371,191 +825,943 @@ class MultiplayerGame:
         initial_state = self.initial_state
         alphabet = Alphabet(self.alphabet[player])
         
-        transitions = [Transition(t.start, (t.joint_action[player],), t.end) for t in self.transitions]
+        transitions = self.transitions.project(player, alphabet)
         partitionings = (self.partitionings[player],)
         
-        attributes = self.graph.graph["graph"]
+        attributes = self.attributes
         
         return MultiplayerGame(states, initial_state, alphabet, transitions, partitionings, **attributes)
         
     
-    def _synchronous_product(self, games):
-        """Combine singleplayer knowledge-based games into a single knowledge-based multiplayer game"""
+    def _explore_product(self, games, states, stats=NO_STATS, previous=None, changed=None, representative=None):
+        """Explore the synchronous product of singleplayer knowledge-based games breadth-first
+
+        Yields each explored state together with a list of its outgoing transitions, starting with the
+        initial state. The states are added to the dict states, indexed by their knowledge, when they
+        are discovered.
+
+        representative -- if given, a function which maps a tuple of knowledge to the representative of
+                          its orbit under a group of symmetries. Only the representatives are explored,
+                          and the transitions lead to the representatives of their targets"""
         
         initial_states = tuple(game.initial_state for game in games)
         initial_knowledges = tuple(state.knowledges[0] for state in initial_states)
-        transitions = []
         
-        states = {initial_knowledges: State(*initial_knowledges)}
+        previous_states, previous_successors = _previous_successors(previous)
+        if previous is not None or representative is not None:
+            player_states = [{state.knowledges[0]: state for state in game.states} for game in games]
         
-        tested = set()
+        states[initial_knowledges] = previous_states.get(initial_knowledges) or State(*initial_knowledges)
+        
+        #a tuple is only queued when its state is created, so every tuple is explored once
         queue = deque([(initial_states, consistent(initial_states))])
         
-        """
-        debugThread = None
-        done = False
-        counter = 0
-        if debug:
-            def checker():
-                i = 0
-                while not done:
-                    i += 1
-                    if i == 10:
-                        print(str(counter) + " / " + str(len(queue)) + " / " + str(len(states)))
-                        i = 0
-                    time.sleep(0.5)
-                    
-            
-            debugThread = threading.Thread(target=checker, daemon=True)
-            debugThread.start()
-        """
-            
-        while len(queue):
-            #counter += 1
-            #print("Loop!")
-            state_tuple, possible = queue.pop()
-            #print(state_tuple)
-            
-            if state_tuple in tested:
-                #print("Tested, skipping")
-                continue
-            else:
-                tested.add(state_tuple)
-            
-            #print("Possible: " + str(possible))
-            for joint_action in self.alphabet.permute():
-                #print("Action: " + str(joint_action))
+        #joint actions which are in the same class in this game, and whose actions are in the same class
+        #in the game of every player, lead to the same successors
+        joint_classes = self.transitions.action_classes()
+        player_classes = [game.transitions.action_classes() for game in games]
+        class_ids = {}
+        action_classes = [class_ids.setdefault((joint_classes[i],) + tuple(player_classes[player][self.alphabet.components[player][i]] for player in range(self.player_count)), len(class_ids))
+                          for i in range(len(self.alphabet.joint_actions))]
+        
+        explored = 0
+        reused = 0
+        shared = 0
+        inconsistent = 0
+        transition_count = 0
+        max_queue = 0
+        
+        try:
+            while len(queue):
+                if len(queue) > max_queue:
+                    max_queue = len(queue)
                 
-                possible_post = self.post(joint_action, possible)
-                #print("Possible (post): " + str(possible_post))
+                state_tuple, possible = queue.pop()
                 
-                players_post = [games[i].post(joint_action[i], state_tuple[i]) for i in range(self.player_count)]
-                #print("Players' post (unfiltered): " + str(players_post))
+                explored += 1
+                if stats.progress and explored % stats.interval == 0:
+                    stats.progress(explored, len(queue), len(states))
                 
-                for i in range(self.player_count):
-                    players_post[i] = set(filter(lambda state: not state.knowledges[0].isdisjoint(possible_post), players_post[i]))
-                #print("Players' post (filtered):   " + str(players_post))
+                k = tuple(state.knowledges[0] for state in state_tuple)
+                fromstate = states[k]
+                transitions = []
                 
-                for possible_knowledge in _permute(players_post):
-                    #print("Possible knowledge: " + str(possible_knowledge))
-                    knowledge_tuple = tuple(state.knowledges[0] for state in possible_knowledge)
-                    if knowledge_tuple not in states:
-                        #print("It's new")
-                        cons = consistent(possible_knowledge)
-                        #print("Consistent: " + str(cons))
-                        
-                        if len(cons):
-                            #print("Adding to res and queue")
-                            states[knowledge_tuple] = State(*knowledge_tuple)
-                            queue.appendleft((possible_knowledge, cons))
-                        else:
+                if previous is not None and k in previous_states and all(knowledge.isdisjoint(changed) for knowledge in k):
+                    #none of the possible states have changed, so neither have the successors
+                    for joint_action, end in previous_successors[previous_states[k]]:
+                        if end.knowledges not in states:
+                            states[end.knowledges] = end
+                            possible_knowledge = tuple(player_states[i][end.knowledges[i]] for i in range(self.player_count))
+                            queue.appendleft((possible_knowledge, end.consistent()))
+                        transitions.append(Transition(fromstate, joint_action, states[end.knowledges]))
+                    reused += 1
+                
+                else:
+                    class_successors = {}
+                    for joint_action, action_class in zip(self.alphabet.joint_actions, action_classes):
+                        successors = class_successors.get(action_class)
+                        if successors is not None:
+                            shared += 1
+                            transitions.extend([Transition(fromstate, joint_action, tostate) for tostate in successors])
                             continue
-                    
-                    #print("Adding transition")
-                    k = tuple(state.knowledges[0] for state in state_tuple)
-                    fromstate = states[k]
-                    tostate = states[knowledge_tuple]
-                    
-                    transitions.append(Transition(fromstate, joint_action, tostate))
+                        
+                        successors = class_successors[action_class] = []
+                        possible_post = self.post(joint_action, possible)
+                        
+                        players_post = [games[i].post(joint_action[i], state_tuple[i]) for i in range(self.player_count)]
+                        
+                        for i in range(self.player_count):
+                            players_post[i] = set(filter(lambda state: not state.knowledges[0].isdisjoint(possible_post), players_post[i]))
+                        
+                        for possible_knowledge in _permute(players_post):
+                            knowledge_tuple = tuple(state.knowledges[0] for state in possible_knowledge)
+                            if representative is not None and knowledge_tuple not in states:
+                                #the tuple is replaced by the representative of its orbit, which is consistent if the tuple is
+                                if not len(consistent(possible_knowledge)):
+                                    inconsistent += 1
+                                    continue
+                                possible_knowledge = tuple(player_states[i][knowledge] for i, knowledge in enumerate(representative(knowledge_tuple)))
+                                knowledge_tuple = tuple(state.knowledges[0] for state in possible_knowledge)
+                            
+                            if knowledge_tuple not in states:
+                                cons = consistent(possible_knowledge)
+                                
+                                if len(cons):
+                                    states[knowledge_tuple] = previous_states.get(knowledge_tuple) or State(*knowledge_tuple)
+                                    states[knowledge_tuple]._consistent = frozenset(cons)
+                                    queue.appendleft((possible_knowledge, cons))
+                                else:
+                                    inconsistent += 1
+                                    continue
+                            
+                            successors.append(states[knowledge_tuple])
+                            transitions.append(Transition(fromstate, joint_action, states[knowledge_tuple]))
+                
+                transition_count += len(transitions)
+                yield fromstate, transitions
         
-        #done = True
+        finally:
+            stats.count("knowledge tuples explored", explored)
+            stats.count("reused knowledge tuples", reused)
+            stats.count("joint actions with shared successors", shared)
+            stats.count("inconsistent knowledge tuples", inconsistent)
+            stats.count("multiplayer transitions created", transition_count)
+            stats.maximum("multiplayer queue length", max_queue)
+    
+    def _synchronous_product(self, games, stats=None, previous=None, changed=None, representative=None):
+        """Combine singleplayer knowledge-based games into a single knowledge-based multiplayer game
+
+        stats -- if given, a KBSCStats object which collects timings and counters from the construction
+        previous, changed -- see KBSC()
+        representative -- see _explore_product()"""
         
-        initial_state = states[initial_knowledges]
-        states = list(states.values())
-        attributes = self.graph.graph["graph"]
+        if stats is None:
+            stats = NO_STATS
+        
+        with stats.phase("synchronous product"):
+            states = {}
+            transitions = TransitionTable(self.alphabet)
+            for state, state_transitions in self._explore_product(games, states, stats, previous, changed, representative):
+                transitions.extend(state_transitions)
+            
+            initial_state = states[tuple(game.initial_state.knowledges[0] for game in games)]
+            states = list(states.values())
+            attributes = self.attributes
+            partitionings = MultiplayerGame._knowledge_partitionings(states, self.player_count)
+        
+        stats.count("multiplayer states created", len(states))
+        
+        with stats.phase("multiplayer game construction"):
+            return MultiplayerGame(states, initial_state, self.alphabet, transitions, partitionings, **attributes)
+    
+    def _knowledge_partitionings(states, player_count):
+        """Get the partitionings of a knowledge-based game, where the states with the same knowledge of a player form an observation"""
         
-        observation_dicts = [{} for player in range(self.player_count)]
+        observation_dicts = [{} for player in range(player_count)]
         for state in states:
-            for i in range(self.player_count):
+            for i in range(player_count):
                 if state[i] in observation_dicts[i]:
                     observation_dicts[i][state[i]].add(state)
                 else:
                     observation_dicts[i][state[i]] = {state}
-            
-        partitionings = tuple(Partitioning(*[Observation(*observation_dicts[i][knowledge]) for knowledge in observation_dicts[i]]) for i in range(self.player_count))
         
-        #print("Sync game creation")
-        return MultiplayerGame(states, initial_state, self.alphabet, transitions, partitionings, **attributes)
+        return tuple(Partitioning(*[Observation(*observation_dicts[i][knowledge]) for knowledge in observation_dicts[i]]) for i in range(player_count))
+    
+    def _explore_knowledge(self, states, stats=NO_STATS, previous=None, changed=None, representative=None):
+        """Explore the knowledge-based subset construction of a singleplayer game breadth-first
+
+        Yields each explored state together with a list of its outgoing transitions, starting with the
+        initial state. The states are added to the dict states, indexed by their knowledge, when they
+        are discovered.
+
+        representative -- see _explore_product()"""
         
+        partitioning = self.partitionings[0]
         
+        previous_states, previous_successors = _previous_successors(previous)
         
-    def KBSC(self):
-        """Apply the KBSC to the game (or MKBSC in the multiplayer case)"""
+        initial_state = previous_states.get((frozenset({self.initial_state}),)) or State(frozenset({self.initial_state}))
+        states[initial_state[0]] = initial_state
         
-        if self.player_count > 1:
-            games = [self.project(player).KBSC() for player in range(self.player_count)]
-            game = self._synchronous_product(games)
-            return game
-            
-        else:
-            #print("Singleplayer KBSC")
-            partitioning = self.partitionings[0]
-            
-            initial_state = State(frozenset({self.initial_state}))
-            states = {initial_state[0]: initial_state}
-            
-            transitions = []
-            queue = deque([initial_state])
-            tested = set()
-            
+        queue = deque([initial_state])
+        tested = set()
+        reused = 0
+        shared = 0
+        transition_count = 0
+        
+        #actions in the same class lead to the same successors
+        action_classes = self.transitions.action_classes()
+        max_queue = 0
+        
+        try:
             while len(queue):
+                if len(queue) > max_queue:
+                    max_queue = len(queue)
+                
                 fromstate = queue.pop()
                 if fromstate in tested:
                     continue
                 else:
                     tested.add(fromstate)
                 
-                for action in self.alphabet[0]:
-                    post_states = self.post(action, fromstate.knowledges[0])
-                    for obs in partitioning:
-                        knowledge = post_states.intersection(obs.states)
-                        if knowledge:
-                            knowledge = frozenset(knowledge)
-                            tostate = states.get(knowledge)
-                            if not tostate:
-                                tostate = State(knowledge)
-                                states[knowledge] = tostate
-                                queue.appendleft(tostate)
-                            
-                            
-                            transitions.append(Transition(fromstate, (action,), tostate))
+                transitions = []
+                
+                if previous is not None and fromstate in previous_successors and fromstate[0].isdisjoint(changed):
+                    #none of the possible states have changed, so neither have the successors
+                    for joint_action, tostate in previous_successors[fromstate]:
+                        if tostate[0] not in states:
+                            states[tostate[0]] = tostate
+                            queue.appendleft(tostate)
+                        transitions.append(Transition(fromstate, joint_action, tostate))
+                    reused += 1
+                
+                else:
+                    class_successors = {}
+                    for action, action_class in zip(self.alphabet[0], action_classes):
+                        successors = class_successors.get(action_class)
+                        if successors is not None:
+                            shared += 1
+                            transitions.extend([Transition(fromstate, (action,), tostate) for tostate in successors])
+                            continue
+                        
+                        successors = class_successors[action_class] = []
+                        post_states = self.post(action, fromstate.knowledges[0])
+                        for obs in partitioning:
+                            knowledge = post_states.intersection(obs.states)
+                            if knowledge:
+                                knowledge = frozenset(knowledge)
+                                if representative is not None and knowledge not in states:
+                                    knowledge = representative((knowledge,))[0]
+                                tostate = states.get(knowledge)
+                                if not tostate:
+                                    tostate = previous_states.get((knowledge,)) or State(knowledge)
+                                    states[knowledge] = tostate
+                                    queue.appendleft(tostate)
+                                
+                                successors.append(tostate)
+                                transitions.append(Transition(fromstate, (action,), tostate))
+                
+                transition_count += len(transitions)
+                yield fromstate, transitions
+        
+        finally:
+            stats.count("singleplayer states explored", len(tested))
+            stats.count("reused singleplayer states", reused)
+            stats.count("actions with shared successors", shared)
+            stats.count("singleplayer transitions created", transition_count)
+            stats.maximum("singleplayer queue length", max_queue)
+    
+    def KBSC(self, stats=None, previous=None, changed=None, symmetries=None):
+        """Apply the KBSC to the game (or MKBSC in the multiplayer case)
+
+        stats -- if given, a KBSCStats object which collects the time spent in each phase of the
+                 construction, the number of explored states, created transitions etc.
+        previous -- the KBSC of an earlier version of this game, see IncrementalKBSC. The transitions of
+                    knowledge states which do not contain any changed states are copied from it
+        changed -- the states whose transitions, or the observations of whose successors, differ from the earlier version
+        symmetries -- if given, a list of symmetries of the game (see Symmetry), or "auto" to use all the
+                      symmetries found by symmetries(). Only one state is then constructed for every orbit
+                      of states under the group generated by the symmetries, and the transitions lead to the
+                      representatives of their targets. The observations only group the representatives.
+                      The full KBSC is restored by expand_KBSC()"""
+        
+        if stats is None:
+            stats = NO_STATS
+        assert previous is None or changed is not None
+        assert previous is None or symmetries is None
+        
+        representative = None
+        if symmetries is not None:
+            with stats.phase("symmetries"):
+                group = self._symmetry_group(symmetries)
+                representative = _orbit_representative(group, self.states)
+            stats.count("symmetries", len(group))
+        
+        if self.player_count > 1:
+            assert previous is None, "use IncrementalKBSC to update the MKBSC of a multiplayer game"
+            return self._synchronous_product(self._player_KBSCs(stats), stats, representative=representative)
             
-            states = list(states.values())
+        else:
+            with stats.phase("singleplayer KBSC"):
+                states = {}
+                transitions = TransitionTable(self.alphabet)
+                for state, state_transitions in self._explore_knowledge(states, stats, previous, changed, representative):
+                    transitions.extend(state_transitions)
+                
+                initial_state = states[frozenset({self.initial_state})]
+                states = list(states.values())
+                
+                partitionings = (Partitioning(*[Observation(state) for state in states]),)
+                attributes = self.attributes
             
-            partitionings = (Partitioning(*[Observation(state) for state in states]),)
-            attributes = self.graph.graph["graph"]
+            #every state is discovered from the initial state, so there are no unreachable states to remove
+            with stats.phase("singleplayer game construction"):
+                return MultiplayerGame(states, initial_state, self.alphabet, transitions, partitionings, **attributes)
+    
+    def _symmetry_group(self, symmetries):
+        """Get the group generated by a list of symmetries of the game, or all its symmetries if symmetries is "auto"
+
+        Raises a ValueError if one of the symmetries is not a symmetry of the game"""
+        
+        if symmetries == "auto":
+            return self.symmetries()
+        
+        symmetries = [symmetry.resolve(self) for symmetry in symmetries]
+        for symmetry in symmetries:
+            if not symmetry.is_symmetry_of(self):
+                raise ValueError("Not a symmetry of the game: " + repr(symmetry))
+        return _closure(symmetries)
+    
+    def expand_KBSC(self, game, symmetries):
+        """Restore the full KBSC of the game from a KBSC constructed with symmetries
+        
+        The successors of every state in game are computed again, and mapped by every symmetry in the
+        group. The states of game are kept, and the other states are created.
+        
+        game -- the result of KBSC(symmetries=symmetries)
+        symmetries -- the same symmetries as were given to KBSC()"""
+        
+        group = self._symmetry_group(symmetries)
+        successors = self._knowledge_successors()
+        
+        states = {state.knowledges: state for state in game.states}
+        def lookup(knowledges):
+            state = states.get(knowledges)
+            if state is None:
+                state = State(*knowledges)
+                states[knowledges] = state
+            return state
+        
+        transitions = TransitionTable(self.alphabet)
+        added = set()
+        for state in game.states:
+            state_successors = list(successors(state.knowledges, state.consistent()))
+            for symmetry in group:
+                start = lookup(symmetry.knowledges(state.knowledges))
+                for joint_action, knowledges, cons in state_successors:
+                    transition = (start, symmetry.joint_action(joint_action), lookup(symmetry.knowledges(knowledges)))
+                    if transition not in added:
+                        added.add(transition)
+                        transitions.append(*transition)
+        
+        states = list(states.values())
+        partitionings = MultiplayerGame._knowledge_partitionings(states, self.player_count)
+        return MultiplayerGame(states, game.initial_state, self.alphabet, transitions, partitionings, **game.attributes)
+    
+    def _player_KBSCs(self, stats=NO_STATS):
+        """Return the KBSC of the projection of the game onto each player"""
+        games = []
+        for player in range(self.player_count):
+            with stats.phase("projection"):
+                projection = self.project(player)
+            games.append(projection.KBSC(stats))
+        return games
+    
+    def KBSC_stream(self, stats=None):
+        """Apply the KBSC to the game one state at a time, without constructing the resulting game
+
+        Yields a tuple (state, transitions) for each state in the constructed game in breadth-first order,
+        starting with the initial state, where transitions is a list of the outgoing transitions of the
+        state. The iteration can be stopped at any time, ex. when a certain state has been found. Only the
+        knowledge of the discovered states is kept in memory (and, for multiplayer games, the KBSC of
+        each player's projection). See also serialization.stream_to_file().
+
+        stats -- if given, a KBSCStats object, see KBSC()"""
+        
+        if stats is None:
+            stats = NO_STATS
+        
+        if self.player_count > 1:
+            return self._explore_product(self._player_KBSCs(stats), {}, stats)
+        else:
+            return self._explore_knowledge({}, stats)
+    
+    def _knowledge_successors(self):
+        """Return a function which computes the successors of a state in the KBSC directly from this game
+
+        The function is given the knowledge of each player and the consistent states of a state in the
+        KBSC, and yields (joint_action, knowledges, consistent) for each of its successors. This is the
+        same as the synchronous product of the KBSC of the projections, without constructing them."""
+        
+        joint_posts = {}
+        player_posts = [{} for player in range(self.player_count)]
+        for start, joint_action, end in self.transitions.triples():
+            index = joint_posts.setdefault(joint_action, {})
+            index.setdefault(start, set()).add(end)
+            for player, action in enumerate(joint_action):
+                index = player_posts[player].setdefault(action, {})
+                index.setdefault(start, set()).add(end)
+        
+        observation_of = [{} for player in range(self.player_count)]
+        for player, partitioning in enumerate(self.partitionings):
+            for observation in partitioning:
+                observation_states = frozenset(observation)
+                for state in observation:
+                    observation_of[player][state] = observation_states
+        
+        def post(index, states):
+            res = set()
+            for state in states:
+                if state in index:
+                    res.update(index[state])
+            return res
+        
+        def successors(knowledges, possible):
+            for joint_action in self.alphabet.joint_actions:
+                possible_post = post(joint_posts.get(joint_action, {}), possible)
+                if not len(possible_post):
+                    continue
+                
+                players_post = []
+                for player in range(self.player_count):
+                    #the knowledge after the action is the possible states in each observation
+                    observations = {}
+                    for state in post(player_posts[player].get(joint_action[player], {}), knowledges[player]):
+                        observation = observation_of[player][state]
+                        if observation in observations:
+                            observations[observation].add(state)
+                        else:
+                            observations[observation] = {state}
+                    players_post.append([frozenset(knowledge) for knowledge in observations.values() if not knowledge.isdisjoint(possible_post)])
+                
+                for knowledge_tuple in _permute(players_post):
+                    cons = frozenset.intersection(*knowledge_tuple)
+                    if len(cons):
+                        yield joint_action, knowledge_tuple, cons
+        
+        return successors
+    
+    def search_KBSC(self, target, mode="subset", order="bfs", heuristic=None, max_states=None):
+        """Search the KBSC of the game for a state matching the target, without constructing the KBSC
+
+        The states of the KBSC are explored on the fly from the transitions and observations of this game,
+        and the search stops as soon as a matching state is found.
+
+        target -- an iterable of base states (or the knowledge in base states), or a function which is given
+                  a state of the KBSC and returns true if it matches
+        mode -- how the consistent base of a state has to relate to the target for the state to match:
+                'subset' (default), 'intersects' or 'equals'
+        order -- 'bfs' (default), which finds a shortest path, or 'dfs'
+        heuristic -- if given, a function which is given the consistent states (see State.consistent()) of a
+                     state and estimates its distance to a matching state. The search is then an A* search:
+                     the states are explored in order of their distance from the initial state plus the
+                     estimate, and are tested when they are explored, so the path found is a shortest path
+                     if the heuristic never overestimates the distance. For example, heuristic=len prefers
+                     states where the players' combined knowledge is small, but may overestimate
+        max_states -- if given, the search gives up after discovering this many states
+
+        Returns a tuple (path, state), where path is the list of joint actions leading from the initial
+        state to the matching state, or None if no matching state was found"""
+        
+        if order not in ("bfs", "dfs"):
+            raise ValueError("Unknown order: " + repr(order))
+        
+        if callable(target):
+            matches = target
+        else:
+            base_states = self._base_index()[1]
+            def lookup(state):
+                if type(state) is State:
+                    return state
+                if state not in base_states:
+                    raise KeyError("Could not find a matching state: " + repr(state))
+                return base_states[state]
+            target = frozenset(lookup(t) for t in target)
+            tests = {
+                "subset": lambda base: base <= target,
+                "intersects": lambda base: not base.isdisjoint(target),
+                "equals": lambda base: base == target,
+            }
+            if mode not in tests:
+                raise ValueError("Unknown mode: " + repr(mode))
+            test = tests[mode]
+            matches = lambda state: test(state.consistent_base())
+        
+        successors = self._knowledge_successors()
+        
+        counter = 0
+        frontier = [] if heuristic is not None else deque()
+        def push(state, depth):
+            nonlocal counter
+            counter += 1
+            if heuristic is not None:
+                heappush(frontier, (depth + heuristic(state.consistent()), counter, state, depth))
+            else:
+                frontier.append((state, depth))
+        def pop():
+            if heuristic is not None:
+                return heappop(frontier)[2:]
+            elif order == "bfs":
+                return frontier.popleft()
+            else:
+                return frontier.pop()
+        
+        def found(state):
+            path = []
+            knowledges = state.knowledges
+            while parents[knowledges] is not None:
+                knowledges, joint_action = parents[knowledges]
+                path.append(joint_action)
+            path.reverse()
+            return path, state
+        
+        initial_state = State(*(frozenset({self.initial_state}) for player in range(self.player_count)))
+        parents = {initial_state.knowledges: None}
+        depths = {initial_state.knowledges: 0}
+        if heuristic is None and matches(initial_state):
+            return found(initial_state)
+        push(initial_state, 0)
+        
+        while len(frontier):
+            state, depth = pop()
+            if heuristic is not None:
+                #in A*, a state is skipped if it has been reached by a shorter path since it was pushed
+                if depth > depths[state.knowledges]:
+                    continue
+                if matches(state):
+                    return found(state)
             
-            #print("KBSC game creation")
-            return MultiplayerGame(states, initial_state, self.alphabet, transitions, partitionings, remove_unreachable=True, **attributes)
+            for joint_action, knowledges, cons in successors(state.knowledges, state.consistent()):
+                new = knowledges not in parents
+                if not new and (heuristic is None or depths[knowledges] <= depth + 1):
+                    continue
+                parents[knowledges] = (state.knowledges, joint_action)
+                depths[knowledges] = depth + 1
+                
+                new_state = State(*knowledges)
+                new_state._consistent = cons
+                if heuristic is None and matches(new_state):
+                    return found(new_state)
+                if new and max_states is not None and len(parents) >= max_states:
+                    return None
+                push(new_state, depth + 1)
+        
+        return None
+    
+    def estimate_kbsc_size(self, time_budget=1.0, explore=0.5, samples=None, confidence=0.95, seed=None):
+        """Estimate the number of states and transitions in the KBSC of the game without constructing it
+        
+        The KBSC is first explored breadth-first directly from this game, as in search_KBSC(), for a part
+        of the time budget. If the exploration completes, the exact sizes are returned. Otherwise:
+        
+        - The explored states, and the transitions from them, are lower bounds.
+        - The states of the KBSC are tuples of states in the KBSC of each player's projection whose
+          knowledge has a common state. The number of such tuples, and the sum of their numbers of
+          transitions, are upper bounds, which are estimated by testing random tuples for the rest of the
+          time budget (or counted exactly, if there are few tuples and they are all tested in time). The
+          bounds hold with the given confidence. Until enough tested tuples have a common state, the
+          transitions are instead bounded by the states, times the largest possible number of transitions
+          from a state.
+        - The estimate counts how many times each state has been reached by the exploration, and adds the
+          states which have not been reached yet by the Chao1 estimator of unseen species. It tends to be
+          too small early in the exploration, and is kept within the bounds.
+        
+        Returns a dict with the estimated "states" and "transitions", their bounds "states_bounds" and
+        "transitions_bounds", whether the sizes are "exact", the number of states "explored" and the number
+        of random tuples tested, "samples". The transitions are estimated from the average number of
+        transitions of the explored states.
+        
+        time_budget -- the approximate maximum number of seconds spent
+        explore -- the part of the time budget spent exploring breadth-first
+        samples -- the maximum number of random tuples tested, but at least 256 are tested
+        confidence -- the confidence level of the upper bounds
+        seed -- the seed of the random number generator"""
+        from time import perf_counter
+        from statistics import NormalDist
+        
+        start = perf_counter()
+        deadline = start + time_budget
+        successors = self._knowledge_successors()
+        
+        initial = tuple(frozenset({self.initial_state}) for player in range(self.player_count))
+        hits = {initial: 0}
+        queue = deque([(initial, frozenset({self.initial_state}))])
+        explored = 0
+        transition_count = 0
+        while len(queue) and (explored % 64 or explored == 0 or perf_counter() < start + explore * time_budget):
+            knowledges, cons = queue.popleft()
+            explored += 1
+            for joint_action, successor, successor_cons in successors(knowledges, cons):
+                transition_count += 1
+                if successor not in hits:
+                    hits[successor] = 1
+                    queue.append((successor, successor_cons))
+                elif successor != knowledges:
+                    hits[successor] += 1
+        
+        if not len(queue):
+            return {"states": len(hits), "states_bounds": (len(hits), len(hits)), "transitions": transition_count,
+                    "transitions_bounds": (transition_count, transition_count), "exact": True, "explored": explored, "samples": 0}
+        
+        #the number of tuples of player states with a common state, and the sum of their numbers of
+        #transitions, by testing random tuples
+        games = self._player_KBSCs()
+        player_states = [list(game.states) for game in games]
+        tuple_count = 1
+        for states in player_states:
+            tuple_count *= len(states)
+        
+        rng = Random(seed)
+        #whether every tuple is tested once, so that the counts are exact if they are all tested in time
+        enumerated = tuple_count <= 100000 and (samples is None or tuple_count <= samples)
+        if enumerated:
+            #the tuples are tested in random order, so the tested tuples are a random sample if the time runs out
+            indexes = list(range(tuple_count))
+            rng.shuffle(indexes)
+        else:
+            indexes = iter(lambda: rng.randrange(tuple_count), None)
+        
+        tested = 0
+        found = 0
+        degree_sum = 0
+        degree_squares = 0
+        for index in indexes:
+            if tested >= 256 and (samples is not None and tested >= samples or tested % 256 == 0 and perf_counter() >= deadline):
+                break
+            tested += 1
+            
+            state_tuple = []
+            for states in player_states:
+                index, i = divmod(index, len(states))
+                state_tuple.append(states[i])
+            cons = consistent(state_tuple)
+            if len(cons):
+                found += 1
+                degree = sum([1 for successor in successors(tuple(state[0] for state in state_tuple), cons)])
+                degree_sum += degree
+                degree_squares += degree * degree
+        
+        #a state of the KBSC has at most one successor per joint action and combination of observations
+        max_degree = len(self.alphabet.joint_actions)
+        for partitioning in self.partitionings:
+            max_degree *= len(partitioning.observations)
+        
+        if enumerated and tested == tuple_count:
+            upper = found
+            transitions_upper = degree_sum
+        else:
+            #the upper end of the Wilson score interval of the share of tuples with a common state
+            z = NormalDist().inv_cdf(confidence)
+            share = found / tested
+            upper = (share + z * z / (2 * tested) + z * ((share * (1 - share) + z * z / (4 * tested)) / tested) ** 0.5) / (1 + z * z / tested)
+            upper = int(min(1, upper) * tuple_count + 0.5)
+            upper = max(upper, len(hits))
+            
+            transitions_upper = upper * max_degree
+            if found >= 30:
+                #the upper end of the normal confidence interval of the mean number of transitions of a tuple,
+                #which needs enough tuples with a common state to be reliable
+                mean = degree_sum / tested
+                variance = max(0, degree_squares / tested - mean * mean)
+                transitions_upper = min(transitions_upper, int((mean + z * (variance / tested) ** 0.5) * tuple_count + 0.5))
+        #the upper bound is never below the transitions already explored, which are the lower bound
+        transitions_upper = max(transitions_upper, transition_count)
+        
+        once = sum([1 for count in hits.values() if count == 1])
+        twice = sum([1 for count in hits.values() if count == 2])
+        estimate = int(min(upper, len(hits) + once * (once - 1) / (2 * (twice + 1))) + 0.5)
+        transitions = int(min(transitions_upper, max(transition_count, estimate * transition_count / explored)) + 0.5)
+        
+        return {"states": estimate, "states_bounds": (len(hits), upper),
+                "transitions": transitions, "transitions_bounds": (transition_count, transitions_upper),
+                "exact": False, "explored": explored, "samples": tested}
+    
+    def _predecessor_table(self):
+        """Index the distinct (state, joint action) pairs with successors, and their predecessors
+
+        Returns a list of the pairs, a list of the number of distinct successors of each pair, and a dict
+        from each state to the indexes of the pairs leading to it"""
+        pair_index = {}
+        pairs = []
+        successor_counts = []
+        predecessors = {}
+        edges = set()
+        for start, joint_action, end in self.transitions.triples():
+            edge = (start, joint_action, end)
+            if edge in edges:
+                continue
+            edges.add(edge)
+            
+            pair = (start, joint_action)
+            if pair not in pair_index:
+                pair_index[pair] = len(pairs)
+                pairs.append(pair)
+                successor_counts.append(0)
+            i = pair_index[pair]
+            successor_counts[i] += 1
+            
+            if end in predecessors:
+                predecessors[end].append(i)
+            else:
+                predecessors[end] = [i]
+        
+        return pairs, successor_counts, predecessors
+    
+    def attractor(self, target_states):
+        """Compute the states from which the players can force the game into the target states
+
+        The game is treated as a game of perfect information, where the players choose a joint action
+        together and the successor is chosen adversarially among the transitions with that action.
+        Joint actions without transitions from a state can not be chosen in that state. For the
+        projections of a knowledge-based game (and the perfect information view of the MKBSC), this
+        solves the reachability game. The attractor is computed in time linear in the number of
+        transitions, by counting the successors of each state and action which are not yet in the attractor.
+
+        target_states -- the target states, in any of the forms accepted by to_dot()
+
+        Returns a tuple (region, strategy), where region is the set of states in the attractor and
+        strategy is a dict from each state in the region, except the targets, to a joint action which
+        leads closer to the targets"""
+        
+        pairs, remaining, predecessors = self._predecessor_table()
+        
+        region = set(self._target_states(target_states))
+        strategy = {}
+        queue = deque(region)
+        while len(queue):
+            state = queue.pop()
+            for i in predecessors.get(state, ()):
+                remaining[i] -= 1
+                if remaining[i] == 0:
+                    start, joint_action = pairs[i]
+                    if start not in region:
+                        region.add(start)
+                        strategy[start] = joint_action
+                        queue.appendleft(start)
+        
+        return region, strategy
+    
+    def solve(self, target_states, objective="reachability"):
+        """Compute the winning region of the players for a reachability or safety objective
+
+        The game is treated as a game of perfect information, see attractor().
+
+        target_states -- the states to reach or stay within, in any of the forms accepted by to_dot()
+        objective -- 'reachability' (default) or 'safety'. A play which ends in a state without
+                     transitions stays in that state, so it is winning for the safety objective if the
+                     state is safe
+        
+        Returns a tuple (region, strategy), where region is the set of winning states and strategy is a
+        dict from winning states to a winning joint action (for reachability, only outside the targets)"""
+        
+        if objective == "reachability":
+            return self.attractor(target_states)
+        elif objective != "safety":
+            raise ValueError("Unknown objective: " + str(objective))
+        
+        #the opponent wins from the states where every joint action may lead to a losing state
+        pairs, successor_counts, predecessors = self._predecessor_table()
+        available = {}
+        for start, joint_action in pairs:
+            available[start] = available.get(start, 0) + 1
+        
+        safe = self._target_states(target_states)
+        losing = set(state for state in self.states if state not in safe)
+        spoiled = [False] * len(pairs)
+        queue = deque(losing)
+        while len(queue):
+            state = queue.pop()
+            for i in predecessors.get(state, ()):
+                if spoiled[i]:
+                    continue
+                spoiled[i] = True
+                start = pairs[i][0]
+                available[start] -= 1
+                if available[start] == 0 and start not in losing:
+                    losing.add(start)
+                    queue.appendleft(start)
+        
+        region = set(state for state in self.states if state not in losing)
+        strategy = {}
+        for i, (start, joint_action) in enumerate(pairs):
+            if start in region and not spoiled[i] and start not in strategy:
+                strategy[start] = joint_action
+        
+        return region, strategy
+    
+    def minimize(self):
+        """Return the quotient of the game by its coarsest bisimulation which respects the observations, and the state mapping
+
+        Two states are merged if every player observes them in the same way, and for every joint action
+        their successors can be merged as well. The states of the quotient game are one state from each
+        class of merged states (the initial state for its own class), so the knowledge in the states is kept.
+        
+        Returns a tuple (game, mapping), where mapping is a dict from each state in this game to the
+        state in the quotient game which represents it"""
+        
+        observation_of = {}
+        for player, partitioning in enumerate(self.partitionings):
+            for i, observation in enumerate(partitioning):
+                for state in observation:
+                    observation_of[(player, state)] = i
+        
+        partition = {}
+        for state in self.states:
+            key = tuple(observation_of[(player, state)] for player in range(self.player_count))
+            if key in partition:
+                partition[key].append(state)
+            else:
+                partition[key] = [state]
+        
+        block_of = _coarsest_bisimulation(self.transitions.triples(), partition.values())
+        
+        representatives = {block_of[self.initial_state]: self.initial_state}
+        mapping = {}
+        states = []
+        for state in self.states:
+            block = block_of[state]
+            if block not in representatives:
+                representatives[block] = state
+            if representatives[block] is state:
+                states.append(state)
+            mapping[state] = representatives[block]
+        
+        transitions = []
+        added = set()
+        for start, joint_action, end in self.transitions.triples():
+            edge = (mapping[start], joint_action, mapping[end])
+            if edge not in added:
+                added.add(edge)
+                transitions.append(Transition(*edge))
+        
+        partitionings = []
+        for partitioning in self.partitionings:
+            observations = []
+            for observation in partitioning:
+                observation_states = []
+                for state in observation:
+                    if mapping[state] is state:
+                        observation_states.append(state)
+                observations.append(Observation(*observation_states))
+            partitionings.append(Partitioning(*observations))
+        
+        attributes = self.attributes
+        
+        return MultiplayerGame(states, self.initial_state, self.alphabet, transitions, tuple(partitionings), **attributes), mapping
+        
+    def certificate(self, consider_observations=True):
+        """Return a string which is the same for two games exactly when they are isomorphic
+
+        Two games have the same certificate if and only if self.isomorphic(other, consider_observations),
+        so games can be deduplicated by comparing or hashing their certificates, see IsomorphismIndex.
+        The certificate covers the transitions with their joint actions, the initial state and, if
+        consider_observations is true, the observations of every player"""
+        from hashlib import sha256
+        
+        edges = {(start, repr(joint_action), end) for start, joint_action, end in self.transitions.triples()}
+        partitions = []
+        if consider_observations:
+            partitions = [[list(observation) for observation in partitioning if len(observation) > 1] for partitioning in self.partitionings]
+        
+        encoding = _canonical_encoding(list(self.states), self.initial_state, edges, partitions)
+        return sha256(repr(encoding).encode("utf8")).hexdigest()
     
     def isomorphic(self, other, consider_observations=False):
         """Check if two games have isomorphic graphs with regards to nodes and edges
         
         other -- the other game
-        consider_observations -- if true, the equivalence relations from the observations must be the same in both graphs as well"""
+        consider_observations -- if true, the equivalence relations from the observations must be the same in both graphs as well
+        
+        The initial states must be mapped onto each other, and the observations are compared as classes
+        of states while the isomorphism is searched for, see _partition_isomorphic()"""
         
         if len(self.states) != len(other.states):
             return False
-
-        a = self.graph.copy()
-        b = other.graph.copy()
         
-        for g in ((a, self), (b, other)):
-            if consider_observations:
-                for player, partitioning in enumerate(g[1].partitionings):
-                    for observation in partitioning:
-                        if len(observation) > 1:
-                            for start, end in permutations(observation, 2):
-                                g[0].add_edge(start, end, player=str(player))
-            
-            g[0].add_node("hidden")
-            g[0].add_edge("hidden", g[1].initial_state)
+        classes = ([], [])
+        if consider_observations:
+            classes = (self._observation_classes(), other._observation_classes())
+        
+        State.orderable = True
+        try:
+            return _partition_isomorphic(self.graph, other.graph, self.initial_state, other.initial_state, *classes)
+        finally:
+            State.orderable = False
+        
+    def _observation_classes(self):
+        """Get a dict for each player, from every state which is not alone in its observation to the list of states in the observation"""
+        
+        classes = []
+        for partitioning in self.partitionings:
+            player_classes = {}
+            for observation in partitioning:
+                if len(observation) > 1:
+                    members = list(observation)
+                    for state in members:
+                        player_classes[state] = members
+            classes.append(player_classes)
+        return classes
+    
+    def symmetries(self, players=True, actions=True):
+        """Find all the symmetries of the game, see Symmetry
+        
+        Returns a list of the symmetries, which form a group, starting with the identity. The symmetries
+        of the states are found as the isomorphisms of the graph onto itself, once for every permutation
+        of the players and their actions, so this is only feasible for few players and actions.
+        
+        players -- if false, the players are not permuted
+        actions -- if false, the actions of a player are only mapped to the actions in the same
+                   positions of the alphabet of another player"""
+        from networkx import MultiDiGraph
         
+        #the joint actions are the keys of the edges, as a joint action could be taken as the data of an edge
+        graph = MultiDiGraph()
+        graph.add_nodes_from(self.states)
+        graph.add_edges_from((start, end, joint_action, {}) for start, joint_action, end in self.transitions.triples())
+        classes = self._observation_classes()
+        
+        player_permutations = permutations(range(self.player_count)) if players else [tuple(range(self.player_count))]
+        
+        res = []
         State.orderable = True
-        iso = is_isomorphic(a, b, edge_match=lambda x, y: x == y)
-        State.orderable = False
-        return iso
+        try:
+            for player_permutation in player_permutations:
+                if any(len(self.alphabet[player]) != len(self.alphabet[image]) for player, image in enumerate(player_permutation)):
+                    continue
+                
+                if actions:
+                    action_images = product(*[permutations(self.alphabet[image]) for image in player_permutation])
+                else:
+                    action_images = [[self.alphabet[image] for image in player_permutation]]
+                
+                for images in action_images:
+                    action_maps = [dict(zip(self.alphabet[player], player_images)) for player, player_images in enumerate(images)]
+                    symmetry = Symmetry({}, player_permutation, action_maps)
+                    
+                    #the isomorphisms from the graph with permuted actions onto the graph map every transition onto a transition
+                    permuted = MultiDiGraph()
+                    permuted.add_nodes_from(self.states)
+                    permuted.add_edges_from((start, end, symmetry.joint_action(joint_action), {}) for start, joint_action, end in self.transitions.triples())
+                    
+                    matcher = _partition_matcher(permuted, graph, self.initial_state, self.initial_state, classes, [classes[image] for image in player_permutation])
+                    for mapping in matcher.isomorphisms_iter():
+                        res.append(Symmetry(mapping, player_permutation, action_maps))
+        finally:
+            State.orderable = False
         
+        res.sort(key=lambda symmetry: symmetry != Symmetry({}))
+        return res
+    
     def partitioning_profile(self):
         """Return a list of each player's pratitioning of observations larger than a single state
 
@@ -1,6 +1,3 @@
-import networkx as nx
-from networkx.drawing.nx_pydot import to_pydot
-
 class Observation:
     """Represents an observation of several states in a game"""
     _idcounter = 0
@@ -21,6 +18,8 @@ class Observation:
         
     def _subgraph(self, attributes=None):
         """Generates a networkx subgraph of the states"""
+        import networkx as nx
+        
         subgraph = nx.Graph()
         subgraph.add_nodes_from(self.states)
         
@@ -32,6 +31,8 @@ class Observation:
 
     def to_dot(self, attributes=None):
         """Returns the dot representation of the states in the observation"""
+        from networkx.drawing.nx_pydot import to_pydot
+        
         s = to_pydot(self._subgraph(attributes)).to_string()
         s = "subgraph cluster" + str(self.id) + " {" + s[s.index("\n"):]
         return s
@@ -1,13 +1,15 @@
 from .state             import State
 from .multiplayer_game  import MultiplayerGame
+from .helper_functions  import _number_states
 
-from queue      import LifoQueue
 from json       import dumps, loads
-from subprocess import call
+from tempfile   import TemporaryFile
+from shutil     import copyfileobj
+from array      import array
 
 import glob, os
 
-def export(game, filename, view=False, folder="pictures", epistemic="nice", file = "png", supress_edges=False, group_observations=None, target_states=None, **kwargs):
+def export(game, filename, view=False, folder="pictures", epistemic="nice", file = "png", supress_edges=False, group_observations=None, target_states=None, summary=False, **kwargs):
     """Exports the game as a picture
     
     view -- if true, opens the file when done
@@ -15,7 +17,10 @@ def export(game, filename, view=False, folder="pictures", epistemic="nice", file
     epistemic -- how to render the states in the graph. Can be 'verbose', 'nice' or 'isocheck'
     supress_edges -- if true, does not draw labels for the transitions
     group_observations -- if true, the observations will be arranged in marked subgraphs. Only works for singleplayer games
-    target_states -- the states (or singleton knowledge in states) which should be marked in the rendered graph"""
+    target_states -- the states (or singleton knowledge in states) which should be marked in the rendered graph
+    summary -- if true, groups of states are collapsed into summary nodes, which is meant for large games. The
+               kwargs are then passed to MultiplayerGame.to_dot_summary() instead of to_dot()"""
+    from subprocess import call
     
     # Remove image files of e-tree nodes from the last run of the program
     if epistemic == "e-tree":
@@ -25,7 +30,12 @@ def export(game, filename, view=False, folder="pictures", epistemic="nice", file
             os.remove(f)
 
     with open(folder + "/" + filename + ".dot", "w") as dotfile:
-        dotfile.write(game.to_dot(epistemic=epistemic, supress_edges=supress_edges, group_observations=group_observations, target_states=target_states, **kwargs))
+        if summary:
+            if supress_edges:
+                kwargs["max_labels"] = 0
+            dotfile.write(game.to_dot_summary(epistemic=epistemic, target_states=target_states, **kwargs))
+        else:
+            dotfile.write(game.to_dot(epistemic=epistemic, supress_edges=supress_edges, group_observations=group_observations, target_states=target_states, **kwargs))
 
     call(["dot", "-T" + file, folder + "/" + filename + ".dot", "-o", folder + "/" + filename + "." + file])
     if view:
@@ -72,6 +82,204 @@ def to_file(game, filename, folder="games", fileext=".game"):
         for line in _serialize(game):
             f.write(line + "\n")
 
+def to_npz(game, filename, folder="games", fileext=".npz", parent=None):
+    """Export a game to a compressed NumPy .npz file with the arrays of MultiplayerGame.to_arrays()"""
+    import numpy as np
+    
+    if folder and len(folder) != 0:
+        folder += "/"
+    else:
+        folder = ""
+    with open(folder + filename + fileext, mode="wb") as f:
+        np.savez_compressed(f, **game.to_arrays(parent))
+
+def from_npz(filename, folder="games", fileext=".npz", parent=None):
+    """Import a game from a .npz file written by to_npz(), see MultiplayerGame.from_arrays()"""
+    import numpy as np
+    
+    if folder and len(folder) != 0:
+        folder += "/"
+    else:
+        folder = ""
+    with np.load(folder + filename + fileext) as data:
+        return MultiplayerGame.from_arrays(dict(data), parent)
+
+def to_files(games, filename, folder="games", fileext=".game"):
+    """Export games to numbered files, ex. filename0.game, filename1.game, ...
+
+    The games are written one at a time, so an iterable such as MultiplayerGame.generate_random() is
+    never kept in memory. Returns the number of games written"""
+    count = 0
+    for game in games:
+        to_file(game, filename + str(count), folder, fileext)
+        count += 1
+    return count
+
+def stream_to_file(game, filename, folder="games", fileext=".game", stats=None):
+    """Apply the KBSC to a game and write the constructed game to a file while it is being constructed
+
+    The file is equivalent to the one written by to_file(game.KBSC(), ...), but the constructed game is
+    never kept in memory, see MultiplayerGame.KBSC_stream(). Returns the number of states in the constructed game
+
+    stats -- if given, a KBSCStats object, see MultiplayerGame.KBSC()"""
+    if folder and len(folder) != 0:
+        folder += "/"
+    else:
+        folder = ""
+    
+    ids = {}
+    def state_id(state):
+        if state not in ids:
+            ids[state] = len(ids)
+        return ids[state]
+    
+    labels = _joint_action_labels(game.alphabet)
+    
+    #the knowledge states and transitions are written to temporary files, since the file has to begin with the states they refer to
+    with TemporaryFile(mode="w+", encoding="utf8", newline="\n") as knowledge_file, \
+         TemporaryFile(mode="w+", encoding="utf8", newline="\n") as transition_file:
+        
+        initial_state = None
+        observation_dicts = [{} for player in range(game.player_count)]
+        
+        def discover(state):
+            new = state not in ids
+            id = state_id(state)
+            if new:
+                knowledge_file.write("{0}={1}\n".format(id, "|".join(map(lambda knowledge: ",".join([str(state_id(s)) for s in knowledge]), state.knowledges))))
+                if game.player_count > 1:
+                    for player in range(game.player_count):
+                        if state[player] in observation_dicts[player]:
+                            observation_dicts[player][state[player]].append(id)
+                        else:
+                            observation_dicts[player][state[player]] = [id]
+                else:
+                    observation_dicts[0][state] = [id]
+            return id
+        
+        inner_states = set(game.states)
+        for state, transitions in game.KBSC_stream(stats):
+            if initial_state is None:
+                initial_state = discover(state)
+            for transition in transitions:
+                transition_file.write("{0} {1} {2}\n".format(discover(transition.start), labels[game.alphabet.joint_action_ids[transition.joint_action]], discover(transition.end)))
+        
+        #the states of the game and the states in their knowledge, which have only been numbered so far
+        base_lines = []
+        knowledge_lines = []
+        def write_inner(state, written):
+            if state in written:
+                return
+            written.add(state)
+            if state.is_base():
+                base_lines.append("{0}={1}".format(state_id(state), repr(state[0])))
+            else:
+                for knowledge in state.knowledges:
+                    for s in knowledge:
+                        write_inner(s, written)
+                knowledge_lines.append("{0}={1}".format(state_id(state), "|".join(map(lambda knowledge: ",".join([str(state_id(s)) for s in knowledge]), state.knowledges))))
+        
+        written = set()
+        for state in list(ids):
+            if state in inner_states:
+                write_inner(state, written)
+        
+        with open(folder + filename + fileext, mode="w", encoding="utf8", newline="\n") as f:
+            f.write("Alphabet:\n")
+            for playeralphabet in game.alphabet:
+                f.write(",".join([repr(action) for action in playeralphabet]) + "\n")
+            f.write("\nBase States:\n")
+            for line in base_lines:
+                f.write(line + "\n")
+            f.write("\nKnowledge States:\n")
+            for line in knowledge_lines:
+                f.write(line + "\n")
+            knowledge_file.seek(0)
+            copyfileobj(knowledge_file, f)
+            
+            f.write("\nInitial State: " + str(initial_state) + "\n")
+            f.write("\nObservations:\n")
+            for observation_dict in observation_dicts:
+                f.write("|".join([",".join(map(str, observation)) for observation in observation_dict.values()]) + "\n")
+            
+            f.write("\nTransitions:\n")
+            transition_file.seek(0)
+            copyfileobj(transition_file, f)
+            
+            f.write("\nAttributes: " + dumps(game.attributes) + "\n")
+    
+    return sum(len(observation) for observation in observation_dicts[0].values())
+
+def _joint_action_labels(alphabet):
+    """Get the serialized form of every joint action, indexed by the id of the joint action
+
+    The actions are numbered consecutively over the alphabets of all players, see _serialize()"""
+    offsets = []
+    offset = 0
+    for playeralphabet in alphabet:
+        offsets.append(offset)
+        offset += len(playeralphabet)
+    
+    return [",".join([str(offsets[player] + alphabet.components[player][i]) for player in range(len(alphabet))]) for i in range(len(alphabet.joint_actions))]
+
+class SharedGame:
+    """A game whose arrays are kept in a block of shared memory, so that several processes can use one copy
+
+    Pickling a SharedGame only pickles the name of the memory block and the few Python objects of the
+    game, so it can be sent cheaply to the workers of a multiprocessing pool, which call .load() to
+    reconstruct the game. The transitions of a loaded game are read directly from the shared block,
+    and can not be changed. The process which created the SharedGame should call .unlink() when
+    every worker is done with it.
+
+    ex. shared = SharedGame(G)
+        with Pool(4) as pool:
+            results = pool.map(analyze, [shared] * 4)
+        shared.unlink()"""
+    
+    def __init__(self, game):
+        """Copy the arrays of a game to a new block of shared memory, see MultiplayerGame._encode()"""
+        from multiprocessing.shared_memory import SharedMemory
+        
+        arrays, self.objects = MultiplayerGame._encode(game)
+        
+        #the arrays are aligned to 8 bytes, which is enough for any of their types
+        self.layout = {}
+        size = 0
+        for key, values in arrays.items():
+            self.layout[key] = (values.typecode, size, len(values))
+            size += -(-len(values) * values.itemsize // 8) * 8
+        
+        self._memory = SharedMemory(create=True, size=max(size, 1))
+        self.name = self._memory.name
+        for key, values in arrays.items():
+            typecode, offset, length = self.layout[key]
+            self._memory.buf[offset:offset + length * values.itemsize] = values.tobytes()
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_memory"] = None
+        return state
+    
+    def load(self):
+        """Reconstruct the game, reading its arrays from the shared memory without copying them"""
+        from multiprocessing.shared_memory import SharedMemory
+        
+        if self._memory is None:
+            self._memory = SharedMemory(name=self.name)
+        
+        buffer = self._memory.buf
+        arrays = {key: buffer[offset:offset + length * array(typecode).itemsize].cast(typecode).toreadonly() for key, (typecode, offset, length) in self.layout.items()}
+        
+        return MultiplayerGame._decode(arrays, self.objects)
+    
+    def unlink(self):
+        """Free the block of shared memory once every process is done with it"""
+        from multiprocessing.shared_memory import SharedMemory
+        
+        if self._memory is None:
+            self._memory = SharedMemory(name=self.name)
+        self._memory.unlink()
+
 def to_string(game):
     """Export a game to a string"""
     return "\n".join(_serialize(game))
@@ -80,60 +288,29 @@ def _serialize(game):
     #Alphabet
     yield "Alphabet:"
     
-    action_id = 0
-    alphabet_dicts = [{} for player in range(game.player_count)]
-    for i, playeralphabet in enumerate(game.alphabet):
-        for action in playeralphabet:
-            alphabet_dicts[i][action] = action_id
-            action_id += 1
+    for playeralphabet in game.alphabet:
         yield ",".join([repr(action) for action in playeralphabet])
 
     yield ""
 
     
     #States
-    def _pick(_set):
-        for x in _set:
-            return x
-        raise None
-
-    state_id = 0
-    state_dict = {}
-    states = game.states
-    state_stack = LifoQueue()
-
-    while type(_pick(states)[0]) is frozenset:
-        newstates = set()
-        for state in states:
-            state_dict[state] = state_id
-            state_stack.put(state)
-
-            for player in range(game.player_count):
-                newstates.update(state[player])
-            
-            state_id -= 1
-        states = newstates
-
-    id_add = abs(state_id) + len(states) - 1
+    base_states, knowledge_states, state_dict = _number_states(game)
+    
     yield "Base States:"
-
-    state_id -= len(states)
-    for state in states:
-        state_id += 1
-        state_dict[state] = state_id
-        yield "{0}={1}".format(state_id + id_add, repr(state[0]))
+    for state in base_states:
+        yield "{0}={1}".format(state_dict[state], repr(state[0]))
     
     yield ""
     yield "Knowledge States:"
 
-    while state_stack.qsize() != 0:
-        state = state_stack.get()
-        yield "{0}={1}".format(state_dict[state] + id_add, "|".join(map(lambda knowledge: ",".join([str(state_dict[s] + id_add) for s in knowledge]), state.knowledges)))
+    for state in knowledge_states:
+        yield "{0}={1}".format(state_dict[state], "|".join(map(lambda knowledge: ",".join([str(state_dict[s]) for s in knowledge]), state.knowledges)))
 
     yield ""
 
 
-    yield "Initial State: " + str(state_dict[game.initial_state] + id_add)
+    yield "Initial State: " + str(state_dict[game.initial_state])
     yield ""
 
 
@@ -141,19 +318,22 @@ def _serialize(game):
     yield "Observations:"
 
     for partitioning in game.partitionings:
-        yield "|".join([",".join(str(state_dict[state] + id_add) for state in observation) for observation in partitioning])
+        yield "|".join([",".join(str(state_dict[state]) for state in observation) for observation in partitioning])
 
     yield ""
 
     #Transitions
     yield "Transitions:"
 
-    for transition in game.transitions:
-        yield "{0} {1} {2}".format(state_dict[transition.start] + id_add, ",".join([str(alphabet_dicts[player][action]) for player, action in enumerate(transition.joint_action)]), state_dict[transition.end] + id_add)
+    labels = _joint_action_labels(game.alphabet)
+    table = game.transitions
+    ids = [state_dict[state] for state in table.states]
+    for source, action, target in zip(table.sources, table.actions, table.targets):
+        yield "{0} {1} {2}".format(ids[source], labels[action], ids[target])
 
     yield ""
 
-    yield "Attributes: " + dumps(game.graph.graph["graph"])
+    yield "Attributes: " + dumps(game.attributes)
 
 def _parse(iterable, validate=True):
     iterator = iter(iterable)
@@ -0,0 +1,192 @@
+from .state        import State
+from .observation  import Observation
+
+def simulate(game, plays=10000, steps=100, strategies=None, targets=(), seed=None):
+    """Simulate many plays of a game at once, and track the knowledge of every player
+
+    The plays are NumPy arrays with the current state of each play, and are advanced together one step
+    at a time. In every step each player chooses an action from its observation of the current state
+    according to its strategy, and the next state is chosen uniformly among the successors under the
+    joint action. A play which reaches a state without any successors under the chosen joint action is
+    stuck, and stays in that state. The knowledge of a player starts as the initial state, and after
+    each step it is the states which are possible after its own action, and in its observation of the
+    new state, as in the KBSC. The knowledge is stored as bitsets of the states, which are numbered the
+    first time they are reached, so each play only stores the number of its knowledge. The new knowledge
+    is computed once for each distinct knowledge, action and observation, and remembered for later steps,
+    so the time of a step mostly depends on the number of plays and of distinct knowledge.
+
+    Returns a dict with:
+    states -- a dict from the states to the number of plays which end in them
+    knowledge -- a dict for each player, from its knowledge at the end (a frozenset of states) to the number of plays
+    lengths -- an array with the number of steps of each play, which is less than steps if it got stuck
+    state_hits -- an array for each target, with the first step at which each play is in the target, or -1
+    knowledge_hits -- a list for each target with an array for each player, with the first step at which
+                      the knowledge of the player is a subset of the target in each play, or -1
+
+    plays -- the number of plays
+    steps -- the number of steps of each play
+    strategies -- a list with a strategy for each player, which is either None to choose the actions
+                  uniformly at random, or a dict from observations to an action or a dict from actions to
+                  their probabilities. The observations can be given as Observation objects, or as any of
+                  their states (or the knowledge of base states). Observations which are left out are
+                  played uniformly at random
+    targets -- a list of sets of states (or the knowledge of base states)
+    seed -- the seed of the random number generator
+
+    ex. res = simulate(G, 100000, 50, [{0: 'p'}, None], targets=[[2]])
+        print(res["knowledge"][0], (res["knowledge_hits"][0][0] >= 0).mean())"""
+    import numpy as np
+
+    arrays = game.to_arrays()
+    n = len(game.states)
+    ids = {state: i for i, state in enumerate(game.states)}
+    values = {state.knowledges[0]: state for state in game.states if len(state.knowledges) == 1}
+    def lookup(state):
+        if type(state) is State:
+            return ids[state]
+        if state not in values:
+            raise KeyError("Could not find a matching state: " + repr(state))
+        return ids[values[state]]
+
+    rng = np.random.default_rng(seed)
+    words = (n + 63) // 64
+    bits = np.zeros((n, words), dtype="<u8")
+    bits[np.arange(n), np.arange(n) // 64] = np.left_shift(np.uint64(1), (np.arange(n) % 64).astype(np.uint64))
+
+    indptr = arrays["action_indptr"]
+    indices = arrays["action_indices"]
+    joint_actions = arrays["joint_actions"]
+    observations = arrays["observations"]
+
+    #the joint action played by each combination of the players' actions
+    joint_ids = np.zeros([len(actions) for actions in game.alphabet], dtype=np.int64)
+    joint_ids[tuple(joint_actions.T)] = np.arange(len(joint_actions))
+
+    sources = np.concatenate([np.repeat(np.arange(n), np.diff(row)) for row in indptr])
+    transition_actions = np.repeat(np.arange(len(joint_actions)), indptr[:, -1] - indptr[:, 0])
+
+    players = []
+    for player in range(game.player_count):
+        action_count = len(game.alphabet[player])
+        partitioning = game.partitionings[player]
+        observation_count = len(partitioning.observations)
+
+        #the successors of each state under each action of the player
+        successors = np.zeros((action_count, n, words), dtype="<u8")
+        np.bitwise_or.at(successors, (joint_actions[transition_actions, player], sources), bits[indices])
+
+        observation_bits = np.zeros((observation_count, words), dtype="<u8")
+        np.bitwise_or.at(observation_bits, observations[player], bits)
+
+        probabilities = np.full((observation_count, action_count), 1 / action_count)
+        strategy = strategies[player] if strategies is not None else None
+        if strategy:
+            action_ids = {action: i for i, action in enumerate(game.alphabet[player])}
+            for observation, choice in strategy.items():
+                if type(observation) is Observation:
+                    observation = next(iter(observation))
+                row = observations[player, lookup(observation)]
+                if type(choice) is not dict:
+                    choice = {choice: 1}
+                probabilities[row] = 0
+                for action, probability in choice.items():
+                    if action not in action_ids:
+                        raise ValueError("Unknown action of player " + str(player) + ": " + repr(action))
+                    probabilities[row, action_ids[action]] = probability
+                probabilities[row] /= probabilities[row].sum()
+
+        players.append((successors, observation_bits, np.cumsum(probabilities, axis=1), action_count, observation_count))
+
+    target_masks = []
+    target_bits = []
+    for target in targets:
+        mask = np.zeros(n, dtype=bool)
+        mask[[lookup(state) for state in target]] = True
+        target_masks.append(mask)
+        target_bits.append(np.bitwise_or.reduce(bits[mask], axis=0) if mask.any() else np.zeros(words, dtype="<u8"))
+
+    #the distinct knowledge of each player as bitsets, the number of each bitset, whether each knowledge is
+    #a subset of each target, and the number of the knowledge after each (knowledge, action, observation)
+    rows = [[] for player in range(game.player_count)]
+    row_ids = [{} for player in range(game.player_count)]
+    inside = [[[] for target in targets] for player in range(game.player_count)]
+    posts = [{} for player in range(game.player_count)]
+    def intern(player, row):
+        key = row.tobytes()
+        res = row_ids[player].get(key)
+        if res is None:
+            res = row_ids[player][key] = len(rows[player])
+            rows[player].append(row)
+            for t in range(len(targets)):
+                inside[player][t].append(not (row & ~target_bits[t]).any())
+        return res
+
+    current = np.full(plays, arrays["initial_state"], dtype=np.int64)
+    knowledge = [np.full(plays, intern(player, bits[arrays["initial_state"]]), dtype=np.int64) for player in range(game.player_count)]
+    lengths = np.full(plays, steps, dtype=np.int64)
+    alive = np.ones(plays, dtype=bool)
+    state_hits = [np.full(plays, -1, dtype=np.int64) for target in targets]
+    knowledge_hits = [[np.full(plays, -1, dtype=np.int64) for player in range(game.player_count)] for target in targets]
+
+    def record_hits(step):
+        for t in range(len(targets)):
+            hits = state_hits[t]
+            hits[(hits < 0) & target_masks[t][current]] = step
+            for player in range(game.player_count):
+                hits = knowledge_hits[t][player]
+                hits[(hits < 0) & np.array(inside[player][t], dtype=bool)[knowledge[player]]] = step
+
+    record_hits(0)
+    for step in range(1, steps + 1):
+        actions = []
+        for player, (successors, observation_bits, cumulative, action_count, observation_count) in enumerate(players):
+            draws = rng.random(plays)
+            actions.append(np.minimum((draws[:, None] >= cumulative[observations[player, current]]).sum(axis=1), action_count - 1))
+
+        joint = joint_ids[tuple(actions)]
+        start = indptr[joint, current]
+        degree = indptr[joint, current + 1] - start
+        stuck = alive & (degree == 0)
+        lengths[stuck] = step - 1
+        alive &= ~stuck
+        if not alive.any():
+            break
+
+        offsets = (rng.random(plays) * degree).astype(np.int64)
+        current = np.where(alive, indices[np.minimum(start + offsets, len(indices) - 1)], current)
+
+        for player, (successors, observation_bits, cumulative, action_count, observation_count) in enumerate(players):
+            #the new knowledge is only computed once for each distinct knowledge, action and observation
+            codes = (knowledge[player] * action_count + actions[player]) * observation_count + observations[player, current]
+            distinct, inverse = np.unique(codes, return_inverse=True)
+            cache = posts[player]
+            new_ids = np.empty(len(distinct), dtype=np.int64)
+            for i, code in enumerate(distinct.tolist()):
+                res = cache.get(code)
+                if res is None:
+                    rest, observation = divmod(code, observation_count)
+                    row_id, action = divmod(rest, action_count)
+                    members = np.flatnonzero(np.unpackbits(rows[player][row_id].view(np.uint8), bitorder="little")[:n])
+                    row = np.bitwise_or.reduce(successors[action, members], axis=0) & observation_bits[observation]
+                    res = cache[code] = intern(player, row)
+                new_ids[i] = res
+            knowledge[player] = np.where(alive, new_ids[inverse.reshape(-1)], knowledge[player])
+
+        record_hits(step)
+
+    states, counts = np.unique(current, return_counts=True)
+    res = {
+        "states": {game.states[state]: int(count) for state, count in zip(states, counts)},
+        "knowledge": [],
+        "lengths": lengths,
+        "state_hits": state_hits,
+        "knowledge_hits": knowledge_hits
+    }
+    for player in range(game.player_count):
+        distinct, counts = np.unique(knowledge[player], return_counts=True)
+        distribution = {}
+        for row_id, count in zip(distinct.tolist(), counts):
+            members = np.flatnonzero(np.unpackbits(rows[player][row_id].view(np.uint8), bitorder="little")[:n])
+            distribution[frozenset(game.states[i] for i in members)] = int(count)
+        res["knowledge"].append(distribution)
+    return res
@@ -1,7 +1,6 @@
-import networkx as nx
-import hashlib
-from networkx.drawing.nx_pydot          import to_pydot
-from subprocess import call
+def _pick(_set):
+    for x in _set:
+        return x
 
 class State:
     """Represents a game state, with separate knowledge for each player
@@ -20,6 +19,9 @@ class State:
         ex. s = State(1)"""
         
         self.knowledges = tuple(knowledges)
+        self._consistent = None
+        self._consistent_base = None
+        self._labels = {}
         
     def __getitem__(self, index):
         """Get the knowledge of the specified player
@@ -52,15 +54,32 @@ class State:
             return str(tuple(set(self.knowledges[i]) for i in range(len(self.knowledges))))
     
     __indent = "\t"
+    def _label(self, key, render):
+        """Return the cached label of the specified kind, rendering it on first use
+
+        The knowledge of a state never changes, so a label never has to be invalidated. Since the
+        renderers call each other through the cache, every distinct state is only rendered once."""
+        label = self._labels.get(key)
+        if label is None:
+            label = render()
+            self._labels[key] = label
+        return label
+
     def epistemic_verbose(self, level=0):
         """Return a verbose representation of the knowledge. Not recommended for overly iterated games."""
+        s = self._label("verbose", self._epistemic_verbose)
+        if level:
+            s = "".join([State.__indent * level + line for line in s.splitlines(True)])
+        return s
+
+    def _epistemic_verbose(self):
         if len(self.knowledges) == 1:
-            return State.__indent * level + "We are in " + str(self.knowledges[0]) + "\n"
+            return "We are in " + str(self.knowledges[0]) + "\n"
         
         s = ""
         for player, knowledge in enumerate(self.knowledges):
-            s += State.__indent * level + "Player " + str(player) + " knows:\n"
-            s += (State.__indent * (level + 1) + "or\n").join([state.epistemic(level + 1) for state in knowledge])
+            s += "Player " + str(player) + " knows:\n"
+            s += (State.__indent + "or\n").join([state.epistemic_verbose(1) for state in knowledge])
 
         return s
 
@@ -150,6 +169,8 @@ class State:
         return False
 
     def epistemic_trees_recursive_at_depth(self, depth):
+        import networkx as nx
+
         player = 0
         res = True
         for state in self.knowledges:
@@ -174,6 +195,9 @@ class State:
     def epistemic_tree(self, file = "png"):
         """This function creates an e-tree for a specific player based on the knowledge gained from the
         MKBSC-algorithm. """
+        import networkx as nx
+        from networkx.drawing.nx_pydot import to_pydot
+        from subprocess import call
 
         # Build one tree for every player
         player = 0
@@ -206,6 +230,7 @@ class State:
 
     def parse_knowledge(self, parent, player, G):
         '''Function for recursively building the e-tree'''
+        import hashlib
 
         def create_id(node, parent, player):
             '''This function generates a uniqe id for a node in the e-tree.
@@ -263,6 +288,10 @@ class State:
 
     def epistemic_nice(self, level=0):
         """Return a compact but still quite readable representation of the knowledge"""
+        #the representation is the same on every inner level
+        return self._label("nice" if level == 0 else "nice inner", lambda: self._epistemic_nice(level))
+
+    def _epistemic_nice(self, level):
         def __wrap(state, l):
             if len(state.knowledges) > 1:
                 #print("Wrap")
@@ -306,26 +335,42 @@ class State:
                 
     def epistemic_isocheck(self):
         """Return the most compact representation, only containing which states in the base game are possible in this state"""
-        return ", ".join([str(state.knowledges[0]) for state in self.consistent_base()])
+        return self._label("isocheck", lambda: ", ".join([str(state.knowledges[0]) for state in self.consistent_base()]))
 
     def consistent_base(self):
         """Return the states in the base game that are possible in this state
 
-        This assumes that the knowledges in the base game are singletons"""
-        def _pick(_set):
-            for x in _set:
-                return x
-            raise None
-        
-        states = [self]
-        if len(self.knowledges) == 1 and type(self.knowledges[0]) is frozenset:
-            states = {self.knowledges[0]}
+        This assumes that the knowledges in the base game are singletons. The result is computed
+        once and cached, since the knowledge of a state never changes."""
+        if self._consistent_base is None:
+            if self.is_base():
+                self._consistent_base = frozenset({self})
+            else:
+                states = self.consistent()
+                while len(states) > 1 and not _pick(states).is_base():
+                    states = frozenset.intersection(*[state.consistent() for state in states])
+                    
+                if len(states) == 1 and not _pick(states).is_base():
+                    #the consistent base of a single state is already cached (or will be)
+                    self._consistent_base = _pick(states).consistent_base()
+                else:
+                    self._consistent_base = states
         
-        while len(_pick(states).knowledges) > 1:
-            states = set.intersection(*[set.intersection(*[set(state[player]) for player in range(len(self.knowledges))]) for state in states])
+        return self._consistent_base
+
+    def consistent(self):
+        """Return the states in the previous game that are consistent with the knowledge of every player"""
+        if self._consistent is None:
+            if self.is_base():
+                self._consistent = frozenset({self})
+            else:
+                self._consistent = frozenset.intersection(*self.knowledges)
         
-        return states
+        return self._consistent
 
+    def is_base(self):
+        """Return true if the state is a state in a base game, i.e. its knowledge is not a set of states"""
+        return len(self.knowledges) == 1 and type(self.knowledges[0]) is not frozenset
 
     def epistemic_depth(self, ):
         """Returns the depth of the graph"""
@@ -0,0 +1,70 @@
+from contextlib import contextmanager, nullcontext
+from itertools  import chain
+from time       import perf_counter
+
+class KBSCStats:
+    """Collects timings and counters from runs of the KBSC
+
+    Pass an instance as the stats argument of MultiplayerGame.KBSC() or iterate_until_isomorphic().
+    The same instance can be passed to several runs, in which case the numbers are accumulated.
+
+    ex. stats = KBSCStats()
+        G.KBSC(stats=stats)
+        print(stats)"""
+    
+    def __init__(self, progress=None, interval=10000):
+        """Create a new, empty collection of statistics
+
+        progress -- if given, a function which is called as progress(explored, queue_length, state_count)
+                    every interval explored states during the exploration of a game
+        interval -- the number of explored states between calls to progress"""
+        
+        self.times = {}
+        self.counts = {}
+        self.maximums = {}
+        self.progress = progress
+        self.interval = interval
+    
+    @contextmanager
+    def phase(self, name):
+        """Add the wall time spent within the with-statement to the named phase
+
+        ex. with stats.phase("projection"): ..."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0) + perf_counter() - start
+    
+    def count(self, name, n=1):
+        """Add n to the named counter"""
+        self.counts[name] = self.counts.get(name, 0) + n
+    
+    def maximum(self, name, value):
+        """Record the value if it is the highest so far for the name, ex. the length of a queue"""
+        if value > self.maximums.get(name, value - 1):
+            self.maximums[name] = value
+    
+    def as_dict(self):
+        """Return the statistics as a dict of dicts, suitable for ex. json.dumps()"""
+        return {"times": dict(self.times), "counts": dict(self.counts), "maximums": dict(self.maximums)}
+    
+    def __str__(self):
+        lines = []
+        for name, seconds in self.times.items():
+            lines.append("{0:<32} {1:10.4f} s".format(name, seconds))
+        for name, value in chain(self.counts.items(), self.maximums.items()):
+            lines.append("{0:<32} {1:10}".format(name, value))
+        return "\n".join(lines)
+
+
+class _NoStats(KBSCStats):
+    """Stands in for a KBSCStats object when no statistics are collected"""
+    def phase(self, name):
+        return nullcontext()
+    def count(self, name, n=1):
+        pass
+    def maximum(self, name, value):
+        pass
+
+NO_STATS = _NoStats()
@@ -0,0 +1,171 @@
+from .state import State
+
+class Symmetry:
+    """A symmetry of a game, i.e. a permutation of its states which keeps the initial state, the
+    transitions and the observations, possibly together with a permutation of the players and their actions
+
+    A transition from s to t with the joint action a is mapped to a transition from .state(s) to .state(t)
+    with the joint action .joint_action(a), and an observation of player i is mapped to an observation of
+    player .players[i]. The KBSC of a game with symmetries has the same symmetries, acting on the
+    knowledge of each player, see MultiplayerGame.KBSC() and MultiplayerGame.symmetries().
+
+    ex. the wagon problem is symmetric under swapping the players together with the states 1 and 2:
+        Symmetry({1: 2, 2: 1}, players=(1, 0))"""
+
+    def __init__(self, states, players=None, actions=None):
+        """Create a new symmetry
+
+        states -- a dict from states to their images. The states can be given as State objects or as the
+                  knowledge in base states, see resolve(). States which are left out are mapped to themselves
+        players -- a tuple with the image of every player, by default the players are not permuted
+        actions -- a dict for each player, from its actions to the actions of its image. Actions which are
+                   left out are mapped to the same action"""
+
+        self.states = {state: image for state, image in states.items() if state is not image and state != image}
+        if players is not None and tuple(players) == tuple(range(len(players))):
+            players = None
+        self.players = tuple(players) if players is not None else None
+        if actions is not None:
+            actions = tuple({action: image for action, image in player_actions.items() if action != image} for player_actions in actions)
+            if not any(actions):
+                actions = None
+        self.actions = actions
+        self._key = (frozenset(self.states.items()), self.players, tuple(frozenset(player_actions.items()) for player_actions in actions) if actions else None)
+
+    def state(self, state):
+        """Get the image of a state"""
+        return self.states.get(state, state)
+
+    def joint_action(self, joint_action):
+        """Get the image of a joint action"""
+        if self.players is None and self.actions is None:
+            return joint_action
+
+        res = [None] * len(joint_action)
+        for player, action in enumerate(joint_action):
+            if self.actions is not None:
+                action = self.actions[player].get(action, action)
+            res[self.players[player] if self.players is not None else player] = action
+        return tuple(res)
+
+    def knowledges(self, knowledges):
+        """Get the image of a tuple with the knowledge (a set of states) of every player"""
+        res = [None] * len(knowledges)
+        for player, knowledge in enumerate(knowledges):
+            if self.states:
+                knowledge = frozenset([self.states.get(state, state) for state in knowledge])
+            res[self.players[player] if self.players is not None else player] = knowledge
+        return tuple(res)
+
+    def compose(self, other):
+        """Get the symmetry which applies other first and then this symmetry"""
+
+        states = {state: self.state(other.state(state)) for state in set(self.states).union(other.states)}
+        if self.players is None and other.players is None:
+            players = None
+        else:
+            count = len(self.players if self.players is not None else other.players)
+            players = tuple(self._player(other._player(player)) for player in range(count))
+
+        actions = None
+        if self.actions is not None or other.actions is not None:
+            count = len(self.actions if self.actions is not None else other.actions)
+            actions = []
+            for player in range(count):
+                player_actions = {}
+                first = other.actions[player] if other.actions is not None else {}
+                second = self.actions[other._player(player)] if self.actions is not None else {}
+                for action in set(first).union(second):
+                    image = first.get(action, action)
+                    player_actions[action] = second.get(image, image)
+                actions.append(player_actions)
+
+        return Symmetry(states, players, actions)
+
+    def _player(self, player):
+        return self.players[player] if self.players is not None else player
+
+    def resolve(self, game):
+        """Get the same symmetry where the states are given as the State objects of a game
+
+        States which are not State objects are looked up among the base states by their knowledge"""
+
+        def lookup(state):
+            return state if type(state) is State else game.state(state)
+
+        return Symmetry({lookup(state): lookup(image) for state, image in self.states.items()}, self.players, self.actions)
+
+    def is_symmetry_of(self, game):
+        """Check if this is a symmetry of a game, whose states are given as State objects"""
+
+        if self.state(game.initial_state) is not game.initial_state:
+            return False
+        if set(self.states.values()) != set(self.states) or not set(self.states).issubset(game.states):
+            return False
+        if self.players is not None and sorted(self.players) != list(range(game.player_count)):
+            return False
+
+        triples = set(game.transitions.triples())
+        for start, joint_action, end in triples:
+            if (self.state(start), self.joint_action(joint_action), self.state(end)) not in triples:
+                return False
+
+        observations = [{frozenset(observation) for observation in partitioning} for partitioning in game.partitionings]
+        for player, partitioning in enumerate(game.partitionings):
+            for observation in partitioning:
+                if frozenset([self.state(state) for state in observation]) not in observations[self._player(player)]:
+                    return False
+
+        return True
+
+    def __eq__(self, other):
+        return type(other) is Symmetry and self._key == other._key
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return "Symmetry(" + repr(self.states) + ", " + repr(self.players) + ", " + repr(self.actions) + ")"
+
+def _closure(generators):
+    """Get the group generated by some symmetries, as a list starting with the identity"""
+
+    identity = Symmetry({})
+    group = [identity]
+    found = {identity}
+    i = 0
+    while i < len(group):
+        for generator in generators:
+            symmetry = generator.compose(group[i])
+            if symmetry not in found:
+                found.add(symmetry)
+                group.append(symmetry)
+        i += 1
+
+    return group
+
+def _orbit_representative(group, states):
+    """Return a function which maps a tuple of knowledge to the smallest tuple in its orbit under a group
+
+    The tuples are ordered by the positions in the list states of the states in each knowledge. The
+    representative is stored for every tuple in the orbit, so each orbit is only computed once."""
+
+    ids = {state: i for i, state in enumerate(states)}
+    representatives = {}
+
+    def representative(knowledges):
+        res = representatives.get(knowledges)
+        if res is None:
+            orbit = []
+            best = None
+            for symmetry in group:
+                image = symmetry.knowledges(knowledges)
+                key = tuple(sorted([ids[state] for state in knowledge]) for knowledge in image)
+                orbit.append(image)
+                if best is None or key < best:
+                    best = key
+                    res = image
+            for image in orbit:
+                representatives[image] = res
+        return res
+
+    return representative
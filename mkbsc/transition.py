@@ -1,3 +1,5 @@
+from array import array
+
 class Transition:
     """Represents a transition between two states"""
     def __init__(self, start, joint_action, end):
@@ -15,7 +17,168 @@ class Transition:
         
     def label(self):
         """Return the string representation of the joint action"""
-        if len(self.joint_action) > 1:
-            return "(" + ", ".join(self.joint_action) + ")"
-        else:
-            return str(self.joint_action[0])
+        return _label(self.joint_action)
+
+def _label(joint_action):
+    """Return the string representation of a joint action"""
+    if len(joint_action) > 1:
+        return "(" + ", ".join(joint_action) + ")"
+    else:
+        return str(joint_action[0])
+
+class TransitionTable:
+    """Stores the transitions of a game as parallel arrays of source, action and target ids
+
+    The states are numbered in the order they are added to the table, and the joint actions by
+    their ids in the alphabet, see Alphabet.joint_action_ids. Transition objects are only created when the table is
+    iterated over or indexed, so the table can be used wherever a sequence of transitions is expected.
+    A table should not be changed after the game using it has been constructed."""
+    def __init__(self, alphabet, transitions=()):
+        """Create a table for the joint actions of an alphabet
+
+        alphabet -- the alphabet of the game
+        transitions -- an iterable of Transitions to add to the table"""
+        
+        self.alphabet = alphabet
+        self.joint_actions = alphabet.joint_actions
+        self.action_ids = alphabet.joint_action_ids
+        self.states = []
+        self.state_ids = {}
+        self.sources = array("l")
+        self.actions = array("l")
+        self.targets = array("l")
+        self._offsets = None
+        self._order = None
+        self._classes = None
+        
+        self.extend(transitions)
+    
+    def add_state(self, state):
+        """Get the id of a state, adding it to the table if it is not already in it"""
+        
+        state_id = self.state_ids.get(state)
+        if state_id is None:
+            state_id = len(self.states)
+            self.state_ids[state] = state_id
+            self.states.append(state)
+            self._offsets = None
+        return state_id
+    
+    def append(self, start, joint_action, end):
+        """Add a transition to the table"""
+        
+        self.sources.append(self.add_state(start))
+        self.actions.append(self.action_ids[tuple(joint_action)])
+        self.targets.append(self.add_state(end))
+        self._offsets = None
+        self._classes = None
+    
+    def extend(self, transitions):
+        """Add the Transitions of an iterable to the table"""
+        
+        for transition in transitions:
+            self.append(transition.start, transition.joint_action, transition.end)
+    
+    def __len__(self):
+        return len(self.sources)
+    def __iter__(self):
+        """Iterate over the transitions as Transition objects"""
+        
+        states = self.states
+        joint_actions = self.joint_actions
+        for source, action, target in zip(self.sources, self.actions, self.targets):
+            yield Transition(states[source], joint_actions[action], states[target])
+    def __getitem__(self, index):
+        """Get the transition at a certain index as a Transition object"""
+        
+        return Transition(self.states[self.sources[index]], self.joint_actions[self.actions[index]], self.states[self.targets[index]])
+    def __repr__(self):
+        return "TransitionTable(" + str(len(self)) + " transitions)"
+    
+    def triples(self):
+        """Iterate over the transitions as (start, joint_action, end) tuples, without creating Transition objects"""
+        
+        states = self.states
+        joint_actions = self.joint_actions
+        for source, action, target in zip(self.sources, self.actions, self.targets):
+            yield states[source], joint_actions[action], states[target]
+    
+    def _index(self):
+        """Get the transitions sorted by their source as (offsets, order), where the indices of the
+        transitions leaving the state with id i are order[offsets[i]:offsets[i + 1]]"""
+        
+        if self._offsets is None:
+            counts = [0] * (len(self.states) + 1)
+            for source in self.sources:
+                counts[source + 1] += 1
+            for i in range(len(self.states)):
+                counts[i + 1] += counts[i]
+            
+            offsets = array("l", counts)
+            order = array("l", [0]) * len(self.sources)
+            for i, source in enumerate(self.sources):
+                order[counts[source]] = i
+                counts[source] += 1
+            
+            self._offsets = offsets
+            self._order = order
+        return self._offsets, self._order
+    
+    def post(self, joint_action, states):
+        """Get the states that are possible after taking a joint action in one of the specified states"""
+        
+        action = self.action_ids.get(joint_action)
+        if action is None:
+            return set()
+        offsets, order = self._index()
+        actions = self.actions
+        targets = self.targets
+        
+        ids = set()
+        for state in states:
+            source = self.state_ids[state]
+            for i in order[offsets[source]:offsets[source + 1]]:
+                if actions[i] == action:
+                    ids.add(targets[i])
+        return {self.states[i] for i in ids}
+    
+    def action_classes(self):
+        """Get the class of every joint action, where two joint actions are in the same class if they
+        lead from the same states to the same states
+        
+        Returns a list with the class of each joint action id. The classes are numbered in the order of
+        their first joint action, and the joint actions without transitions form a class of their own"""
+        
+        if self._classes is None:
+            relations = [[] for joint_action in self.joint_actions]
+            for source, action, target in zip(self.sources, self.actions, self.targets):
+                relations[action].append((source, target))
+            
+            ids = {}
+            self._classes = [ids.setdefault(frozenset(relation), len(ids)) for relation in relations]
+        return self._classes
+    
+    def neighbors(self, state):
+        """Get the states with a transition from a state"""
+        
+        offsets, order = self._index()
+        source = self.state_ids[state]
+        targets = self.targets
+        return {self.states[targets[i]] for i in order[offsets[source]:offsets[source + 1]]}
+    
+    def project(self, player, alphabet):
+        """Get a copy of the table where each joint action is replaced by the action of a player
+
+        player -- the player to project onto
+        alphabet -- the singleplayer alphabet of the projected game"""
+        
+        table = TransitionTable(alphabet)
+        table.states = list(self.states)
+        table.state_ids = dict(self.state_ids)
+        
+        action_ids = [table.action_ids[(action,)] for action in self.alphabet[player]]
+        components = [action_ids[component] for component in self.alphabet.components[player]]
+        table.sources = array("l", self.sources)
+        table.actions = array("l", (components[action] for action in self.actions))
+        table.targets = array("l", self.targets)
+        return table